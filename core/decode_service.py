@@ -0,0 +1,399 @@
+import threading
+import time
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QBuffer, QByteArray, QIODevice, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QImageIOHandler
+from core.exif_preview import exif_preview_image
+from core.metrics import metrics
+
+# Queue priorities of the non-viewer consumers (viewer loads: see core.prefetch)
+PRIORITY_INFO = 500
+PRIORITY_THUMBNAIL = 0
+
+_SWAPPED_TRANSFORMS = (
+    QImageIOHandler.Transformation.TransformationRotate90,
+    QImageIOHandler.Transformation.TransformationRotate270,
+    QImageIOHandler.Transformation.TransformationMirrorAndRotate90,
+    QImageIOHandler.Transformation.TransformationFlipAndRotate90,
+)
+
+
+def display_ready(image):
+    """
+    image in the format raster QPixmaps use (RGB32, or premultiplied ARGB32
+    with alpha), so QPixmap.fromImage on the GUI thread shares its pixels
+    instead of converting them into a second buffer.
+    """
+    if image is None or image.isNull():
+        return image
+    if image.hasAlphaChannel():
+        fmt = QImage.Format.Format_ARGB32_Premultiplied
+    else:
+        fmt = QImage.Format.Format_RGB32
+    return image if image.format() == fmt else image.convertToFormat(fmt)
+
+
+class DecodeRequest:
+    """
+    One consumer's interest in a file.
+    max_dim is the longest side needed: None for full resolution, 0 for the
+    header only, or a function of the upright full size returning either.
+    derive(image, full_size) turns the decode, already fitted to max_dim,
+    into the product passed to callback(request, product, is_final); it runs
+    on the decode thread. With use_preview the embedded EXIF thumbnail is
+    delivered first, and is final if it's at least max_dim.
+    A request with source=(image, full_size) derives from that image, already
+    in memory and at least max_dim, without opening the file; it isn't fitted.
+    """
+
+    def __init__(self, path, max_dim=None, priority=0, derive=None, callback=None, use_preview=False):
+        self.path = path
+        self.max_dim = max_dim
+        self.priority = priority
+        self.derive = derive
+        self.callback = callback
+        self.use_preview = use_preview
+        self.full_size = None  # upright size of the source, set once the header is read
+        self.decode_s = None   # wall time of the shared read, set with the product
+        self.error = None
+        self.job = None
+
+    def resolve_max_dim(self, full_size):
+        return self.max_dim(full_size) if callable(self.max_dim) else self.max_dim
+
+    def make_product(self, image):
+        return self.derive(image, self.full_size) if self.derive else image
+
+
+class _JobSignals(QObject):
+    done = Signal(object, object, bool)  # job, [(request, product, is_final)], job finished
+
+
+class DecodeJob(QRunnable):
+    """All requests for one path that were queued before it started; decoded once."""
+
+    def __init__(self, path, disk_cache=None, proxy_size=None, read_ahead=None, source=None, buffered=False):
+        super().__init__()
+        self.setAutoDelete(False)  # owned by DecodeService until done
+        self.path = path
+        self.source = source  # (image, full_size) to derive from instead of the file
+        self.disk_cache = disk_cache
+        self.proxy_size = proxy_size
+        self.read_ahead = read_ahead
+        self.buffered = buffered  # waited for read_ahead; else only uses bytes already buffered
+        self.requests = []
+        self.priority = 0
+        self.created = time.perf_counter()
+        self.parked = False  # waiting for read-ahead, not in the thread pool yet
+        self.started = False
+        self.lock = threading.Lock()
+        self.signals = _JobSignals()
+
+    def add(self, request):
+        """Joins request to this job; False once the job has started."""
+        with self.lock:
+            if self.started:
+                return False
+            self.requests.append(request)
+            request.job = self
+            return True
+
+    def remove(self, request):
+        """Withdraws request; False if the job has already started."""
+        with self.lock:
+            if self.started:
+                return False
+            self.requests.remove(request)
+            request.job = None
+            return True
+
+    def run(self):
+        with self.lock:
+            self.started = True
+            requests = list(self.requests)
+        metrics.observe('decode.queue_wait', time.perf_counter() - self.created)
+        delivered = set()  # requests that already got their final product
+        try:
+            if requests:  # all withdrawn while waiting for read-ahead
+                self._decode(requests, delivered)
+        except Exception as e:
+            failed = [r for r in requests if r not in delivered]
+            metrics.count('decode.errors')
+            for request in failed:
+                request.error = request.error or str(e)
+            self.signals.done.emit(self, [(r, None, True) for r in failed], True)
+        else:
+            self.signals.done.emit(self, [], True)
+
+    def _decode(self, requests, delivered):
+        if self.source is not None:
+            image, full_size = self.source
+            results = []
+            for request in requests:
+                request.full_size = full_size
+                results.append((request, self._product(request, image), True))
+                delivered.add(request)
+            self.signals.done.emit(self, results, False)
+            return
+
+        start = time.perf_counter()
+        data = None
+        if self.read_ahead is not None:
+            data = self.read_ahead.get(self.path) if self.buffered else self.read_ahead.peek(self.path)
+        if data is not None:
+            # Already in memory; the buffer must outlive the reader
+            device = QBuffer()
+            device.setData(QByteArray(data))
+            device.open(QIODevice.OpenModeFlag.ReadOnly)
+            reader = QImageReader(device)
+        else:
+            reader = QImageReader(self.path)
+        reader.setAutoTransform(True)
+        raw_size = reader.size()
+        if not raw_size.isValid():
+            raise IOError(reader.errorString() or "Invalid image size")
+        if reader.transformation() in _SWAPPED_TRANSFORMS:
+            full_size = QSize(raw_size.height(), raw_size.width())
+        else:
+            full_size = raw_size
+
+        early = []
+        pending = {}  # request -> longest side needed
+        preview = None
+        for request in requests:
+            request.full_size = full_size
+            max_dim = request.resolve_max_dim(full_size)
+            if max_dim == 0:
+                metrics.count('decode.header_only')
+                early.append((request, self._product(request, None), True))
+                delivered.add(request)
+                continue
+            if request.use_preview:
+                if preview is None:
+                    preview = exif_preview_image(self.path) or False
+                if preview:
+                    metrics.count('decode.exif_previews')
+                    covers = max_dim is not None and max(preview.width(), preview.height()) >= max_dim
+                    early.append((request, self._product(request, display_ready(self._fit(preview, max_dim))), covers))
+                    if covers:
+                        delivered.add(request)
+                        continue
+            pending[request] = max_dim
+        if early:
+            self.signals.done.emit(self, early, False)
+        if not pending:
+            return
+
+        dims = list(pending.values())
+        decode_dim = None if None in dims else max(dims)
+        if decode_dim is not None and max(full_size.width(), full_size.height()) <= decode_dim:
+            decode_dim = None  # not larger than the source; read it as is
+
+        image = None
+        if self.disk_cache and decode_dim is not None and decode_dim == self.proxy_size:
+            image = self.disk_cache.load(self.path, self.proxy_size)
+            metrics.count('disk_cache.hits' if image is not None else 'disk_cache.misses')
+        from_cache = image is not None
+        if image is None:
+            if decode_dim is not None:
+                scale = decode_dim / max(full_size.width(), full_size.height())
+                reader.setScaledSize(QSize(int(raw_size.width() * scale), int(raw_size.height() * scale)))
+            image = reader.read()
+            if image.isNull():
+                raise IOError(reader.errorString() or "Failed to load image")
+        decode_s = time.perf_counter() - start
+        if not from_cache:
+            metrics.observe('decode.full' if decode_dim is None else 'decode.scaled', decode_s)
+
+        fitted = {}
+        results = []
+        for request, max_dim in pending.items():
+            if max_dim not in fitted:
+                # Converted here rather than on the GUI thread when it's shown
+                fitted[max_dim] = display_ready(self._fit(image, max_dim))
+            request.decode_s = decode_s
+            results.append((request, self._product(request, fitted[max_dim]), True))
+            delivered.add(request)
+        self.signals.done.emit(self, results, False)
+
+        # Fill the disk cache after the results are on their way
+        if self.disk_cache and self.proxy_size and not from_cache:
+            proxy = fitted.get(self.proxy_size)
+            if proxy is not None and proxy.size() != full_size:
+                self.disk_cache.store(self.path, self.proxy_size, proxy)
+
+    @staticmethod
+    def _fit(image, max_dim):
+        """image scaled down so its longest side is max_dim (None: unchanged)."""
+        if max_dim is None or max(image.width(), image.height()) <= max_dim:
+            return image
+        return image.scaled(max_dim, max_dim, Qt.AspectRatioMode.KeepAspectRatio,
+                            Qt.TransformationMode.SmoothTransformation)
+
+    @staticmethod
+    def _product(request, image):
+        try:
+            return request.make_product(image)
+        except Exception as e:
+            request.error = str(e)
+            return None
+
+
+class DecodeService(QObject):
+    """
+    The one place files are opened and decoded for display. Requests for a
+    path that is already queued join that job, so the file is read once at
+    the largest size any of them needs and each gets its product derived
+    from that. Decodes whose size is exactly proxy_size go through disk_cache.
+    With a ReadAhead, upcoming files' bytes are read on its own threads and
+    buffered requests (the viewer's) wait for them and decode from memory;
+    other jobs start right away and only use bytes already buffered.
+    Callbacks run on the GUI thread.
+    """
+
+    # A parked job's bytes are ready; emitted from read-ahead I/O threads
+    _bytes_ready = Signal(object)  # job
+
+    def __init__(self, parent=None, disk_cache=None, proxy_size=None, read_ahead=None):
+        super().__init__(parent)
+        self.disk_cache = disk_cache
+        self.proxy_size = proxy_size
+        self.read_ahead = read_ahead
+        self._proxy_only = set()  # scheduled paths that only need a proxy
+        if read_ahead is not None and read_ahead.skip is None:
+            read_ahead.skip = self._skip_read_ahead
+        self.thread_pool = QThreadPool(self)
+        self._queued = {}   # path -> job that can still take requests
+        self._jobs = set()  # every job not yet finished (keeps them alive)
+        # Jobs enter the pool on the GUI thread only, so _requeue never races a start
+        self._bytes_ready.connect(self._start_parked)
+
+    def request(self, path, max_dim=None, priority=0, derive=None, callback=None, use_preview=False,
+                source=None, buffered=False):
+        """
+        Queues a DecodeRequest (see there) and returns it. A buffered request
+        waits for the read-ahead stage to have the file's bytes.
+        """
+        request = DecodeRequest(path, max_dim, priority, derive, callback, use_preview)
+        metrics.count('decode.requests')
+        if source is not None:
+            # Nothing to read or share; derived on its own
+            metrics.count('decode.from_memory')
+            job = DecodeJob(path, source=source)
+            job.add(request)
+            job.priority = priority
+            job.signals.done.connect(self._on_job_done)
+            self._jobs.add(job)
+            metrics.gauge('decode.pending_jobs', len(self._jobs))
+            self.thread_pool.start(job, priority)
+            return request
+
+        queued = self._queued.get(path)
+        # Thumbnails and header reads don't wait behind a job parked for read-ahead
+        if queued is not None and (buffered or not queued.parked) and queued.add(request):
+            metrics.count('decode.merged')
+            if priority > queued.priority:
+                self._requeue(queued, priority)
+            return request
+
+        buffered = buffered and self.read_ahead is not None
+        job = DecodeJob(path, self.disk_cache, self.proxy_size, self.read_ahead, buffered=buffered)
+        job.add(request)
+        job.priority = priority
+        job.signals.done.connect(self._on_job_done)
+        if queued is None or buffered or not queued.parked:
+            self._queued[path] = job
+        self._jobs.add(job)
+        metrics.count('decode.jobs')
+        metrics.gauge('decode.pending_jobs', len(self._jobs))
+        if buffered:
+            # Decode once the bytes are in memory so slow storage doesn't hold
+            # a decode thread; may be called back from an I/O thread
+            job.parked = True
+            self.read_ahead.when_ready(path, lambda: self._bytes_ready.emit(job))
+        else:
+            self.thread_pool.start(job, priority)
+        return request
+
+    def schedule_read_ahead(self, loads):
+        """Passes upcoming (path, is_proxy) loads, nearest first, to the read-ahead stage."""
+        if self.read_ahead is None:
+            return
+        paths = list(dict.fromkeys(path for path, _ in loads))
+        self._proxy_only = set(paths) - {path for path, is_proxy in loads if not is_proxy}
+        self.read_ahead.schedule(paths)
+
+    def _skip_read_ahead(self, path):
+        # Proxies already on disk come from the cache, not the source file
+        return (self.disk_cache is not None and path in self._proxy_only
+                and self.disk_cache.contains(path, self.proxy_size))
+
+    def cancel(self, request):
+        """
+        Withdraws a request that hasn't started decoding. Returns False if it
+        is already running; its callback still comes.
+        """
+        job = request.job
+        if job is None or not job.remove(request):
+            return False
+        if not job.requests:
+            if job.parked or self.thread_pool.tryTake(job):
+                self._forget(job)
+        else:
+            self._requeue(job, max(r.priority for r in job.requests))
+        return True
+
+    def set_priority(self, request, priority):
+        """Moves a queued request; False if it is already running."""
+        job = request.job
+        if job is None or job.started:
+            return False
+        request.priority = priority
+        self._requeue(job, max(r.priority for r in job.requests))
+        return True
+
+    def add_preview(self, request):
+        """Has a queued request deliver the EXIF thumbnail first; False if it is already running."""
+        job = request.job
+        if job is None:
+            return False
+        with job.lock:
+            if job.started:
+                return False
+            request.use_preview = True
+        return True
+
+    def clear(self):
+        """Drops every queued job. Running decodes finish and call back."""
+        for job in list(self._queued.values()):
+            with job.lock:
+                if job.started:
+                    continue
+            if job.parked or self.thread_pool.tryTake(job):
+                self._forget(job)
+
+    def _start_parked(self, job):
+        job.parked = False
+        if job in self._jobs:  # else cancelled or cleared while parked
+            self.thread_pool.start(job, job.priority)
+
+    def _requeue(self, job, priority):
+        if priority == job.priority:
+            return
+        job.priority = priority  # a parked job starts at it
+        if not job.parked and self.thread_pool.tryTake(job):
+            self.thread_pool.start(job, priority)
+
+    def _forget(self, job):
+        if self._queued.get(job.path) is job:
+            del self._queued[job.path]
+        self._jobs.discard(job)
+        metrics.gauge('decode.pending_jobs', len(self._jobs))
+
+    def _on_job_done(self, job, results, finished):
+        if finished:
+            self._forget(job)
+        elif self._queued.get(job.path) is job:
+            del self._queued[job.path]  # already started; new requests get a new job
+        for request, product, is_final in results:
+            if request.callback:
+                request.callback(request, product, is_final)
@@ -0,0 +1,119 @@
+import os
+import hashlib
+import threading
+from PySide6.QtCore import QStandardPaths
+from PySide6.QtGui import QImage
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# After an eviction pass the cache is trimmed to this share of max_bytes
+EVICT_TO = 0.9
+# JPEG quality of stored proxies; display only, exports always read the source
+PROXY_QUALITY = 92
+
+
+def default_cache_dir():
+    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+    return os.path.join(base or os.path.expanduser("~/.cache/QuickCrop"), "proxies")
+
+
+class ProxyDiskCache:
+    """
+    Persistent store of downscaled proxies so reopening a session doesn't
+    decode every source again. Entries are keyed by source path, size, mtime
+    and proxy size, saved upright as JPEG (PNG with alpha),
+    and evicted least recently used once the folder exceeds max_bytes.
+    Thread-safe: loader workers read and fill it from the thread pool.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self._lock = threading.Lock()
+        self._bytes_used = None  # scanned lazily on first store
+
+    def _entry_path(self, path, proxy_size):
+        """Cache file for path, or None if the source can't be read."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        # A stat only: the EXIF orientation lives in the file, so size and mtime cover it
+        key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{proxy_size}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def load(self, path, proxy_size):
+        """Returns the cached proxy QImage for path, or None."""
+        entry = self._entry_path(path, proxy_size)
+        if entry is None:
+            return None
+        for ext in (".jpg", ".png"):
+            image = QImage(entry + ext)
+            if not image.isNull():
+                try:
+                    os.utime(entry + ext)  # mtime doubles as LRU timestamp
+                except OSError:
+                    pass
+                return image
+        return None
+
+    def contains(self, path, proxy_size):
+        entry = self._entry_path(path, proxy_size)
+        return entry is not None and any(os.path.exists(entry + ext) for ext in (".jpg", ".png"))
+
+    def store(self, path, proxy_size, image):
+        entry = self._entry_path(path, proxy_size)
+        if entry is None or image.isNull():
+            return
+        if image.hasAlphaChannel():
+            file_path, fmt, quality = entry + ".png", "PNG", -1
+        else:
+            file_path, fmt, quality = entry + ".jpg", "JPEG", PROXY_QUALITY
+        tmp_path = file_path + f".{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if not image.save(tmp_path, fmt, quality):
+                return
+            os.replace(tmp_path, file_path)
+            size = os.path.getsize(file_path)
+        except OSError as e:
+            print(f"Could not write proxy cache entry for {path}: {e}")
+            return
+
+        with self._lock:
+            if self._bytes_used is None:
+                self._bytes_used = self._scan()[1]
+            else:
+                self._bytes_used += size
+            if self._bytes_used > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        """Returns ([(mtime, size, file path)], total bytes) of finished entries."""
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(".tmp"):
+                        continue
+                    try:
+                        st = item.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, item.path))
+        except OSError:
+            pass
+        return entries, sum(size for _, size, _ in entries)
+
+    def _evict(self):
+        entries, total = self._scan()
+        entries.sort()
+        target = self.max_bytes * EVICT_TO
+        for _, size, file_path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(file_path)
+                total -= size
+            except OSError:
+                pass
+        self._bytes_used = total
@@ -0,0 +1,182 @@
+import math
+from array import array
+from core.processor import calculate_default_crop
+
+_NO_CROP = math.nan
+
+
+class EditStore:
+    """
+    Per-image edit state (crop, aspect ratio, rotation, flips, touched and
+    source size) in typed columns, one row per path. Ratios and upright
+    source shapes are interned, so a ratio switch computes one default crop
+    per distinct shape and fills the crop columns from that table at C speed
+    (see apply_default_crops).
+    Skipped (hidden) images are tracked by the ImageSet, not here.
+    """
+
+    def __init__(self):
+        self._rows = {}    # path -> row
+        self._paths = []   # row -> path
+        self._ratios = []  # ratio id -> ratio string
+        self._ratio_ids = {}
+        self._shapes = [None]  # shape id -> upright (w, h); 0: size not known yet
+        self._shape_ids = {}
+        self._clear_columns()
+
+    def _clear_columns(self):
+        self.crop_x, self.crop_y, self.crop_w, self.crop_h = (array('d') for _ in range(4))  # NaN: no crop
+        self.rotation = array('d')
+        self.flip_h, self.flip_v, self.touched_flags = array('b'), array('b'), array('b')
+        self.ratio_ids = array('H')
+        self.widths, self.heights = array('I'), array('I')  # source size, 0 until known
+        self.shape_ids = array('H')                          # upright size after rotation
+
+    def _columns(self):
+        return (self.crop_x, self.crop_y, self.crop_w, self.crop_h, self.rotation, self.flip_h,
+                self.flip_v, self.touched_flags, self.ratio_ids, self.widths, self.heights, self.shape_ids)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return path in self._rows
+
+    def nbytes(self):
+        """Bytes held by the columns."""
+        return sum(len(column) * column.itemsize for column in self._columns())
+
+    # ── Rows ──
+
+    def extend(self, paths, ratio):
+        """Adds rows for the new paths: no crop, untouched, upright, at ratio."""
+        new = [path for path in dict.fromkeys(paths) if path not in self._rows]
+        if not new:
+            return
+        n = len(new)
+        for path in new:
+            self._rows[path] = len(self._paths)
+            self._paths.append(path)
+        for column in (self.crop_x, self.crop_y, self.crop_w, self.crop_h):
+            column.extend(array('d', [_NO_CROP]) * n)
+        self.rotation.extend(array('d', [0.0]) * n)
+        for column in (self.flip_h, self.flip_v, self.touched_flags):
+            column.extend(array('b', [0]) * n)
+        self.ratio_ids.extend(array('H', [self._ratio_id(ratio)]) * n)
+        for column in (self.widths, self.heights):
+            column.extend(array('I', [0]) * n)
+        self.shape_ids.extend(array('H', [0]) * n)
+
+    def remove(self, path):
+        """Drops path's row; the last row moves into its place."""
+        row = self._rows.pop(path, None)
+        if row is None:
+            return
+        last = len(self._paths) - 1
+        if row != last:
+            moved = self._paths[last]
+            self._paths[row] = moved
+            self._rows[moved] = row
+            for column in self._columns():
+                column[row] = column[last]
+        self._paths.pop()
+        for column in self._columns():
+            column.pop()
+
+    def clear(self):
+        self._rows.clear()
+        self._paths.clear()
+        self._clear_columns()
+
+    # ── One image (KeyError for unknown paths, like a dict) ──
+
+    def crop(self, path):
+        """Normalized (x, y, w, h), or None if no crop was set."""
+        row = self._rows[path]
+        if math.isnan(self.crop_x[row]):
+            return None
+        return (self.crop_x[row], self.crop_y[row], self.crop_w[row], self.crop_h[row])
+
+    def set_crop(self, path, crop):
+        row = self._rows[path]
+        x, y, w, h = crop if crop is not None else (_NO_CROP,) * 4
+        self.crop_x[row], self.crop_y[row], self.crop_w[row], self.crop_h[row] = x, y, w, h
+
+    def ratio(self, path):
+        return self._ratios[self.ratio_ids[self._rows[path]]]
+
+    def set_ratio(self, path, ratio):
+        self.ratio_ids[self._rows[path]] = self._ratio_id(ratio)
+
+    def transform(self, path):
+        """(rotation, flip_h, flip_v)."""
+        row = self._rows[path]
+        return self.rotation[row], bool(self.flip_h[row]), bool(self.flip_v[row])
+
+    def set_transform(self, path, rotation, flip_h, flip_v):
+        row = self._rows[path]
+        self.rotation[row] = rotation
+        self.flip_h[row] = bool(flip_h)
+        self.flip_v[row] = bool(flip_v)
+        self._update_shape(row)
+
+    def touched(self, path):
+        return bool(self.touched_flags[self._rows[path]])
+
+    def set_touched(self, path, touched=True):
+        self.touched_flags[self._rows[path]] = bool(touched)
+
+    def size(self, path):
+        """Source (w, h), or None until known."""
+        row = self._rows[path]
+        return (self.widths[row], self.heights[row]) if self.widths[row] else None
+
+    def set_size(self, path, width, height):
+        row = self._rows[path]
+        self.widths[row] = width
+        self.heights[row] = height
+        self._update_shape(row)
+
+    # ── Bulk ──
+
+    def apply_default_crops(self, ratio, keep=None):
+        """
+        Sets every image to ratio and, where its size is known, to the
+        centred default crop for it, except keep's crop (the image being
+        edited, whose canvas has the exact one).
+        """
+        n = len(self._paths)
+        self.ratio_ids[:] = array('H', [self._ratio_id(ratio)]) * n
+        # Rows whose crop stays: size still loading, or keep
+        kept = [row for row, shape in enumerate(self.shape_ids) if not shape] if 0 in self.shape_ids else []
+        if keep in self._rows:
+            kept.append(self._rows[keep])
+        crops = [(_NO_CROP,) * 4] + [calculate_default_crop(w, h, ratio) for w, h in self._shapes[1:]]
+        for i, name in enumerate(('crop_x', 'crop_y', 'crop_w', 'crop_h')):
+            old = getattr(self, name)
+            table = [crop[i] for crop in crops]
+            new = array('d', map(table.__getitem__, self.shape_ids))
+            for row in kept:
+                new[row] = old[row]
+            setattr(self, name, new)
+
+    # ── Interning ──
+
+    def _ratio_id(self, ratio):
+        ratio_id = self._ratio_ids.get(ratio)
+        if ratio_id is None:
+            ratio_id = self._ratio_ids[ratio] = len(self._ratios)
+            self._ratios.append(ratio)
+        return ratio_id
+
+    def _update_shape(self, row):
+        w, h = self.widths[row], self.heights[row]
+        if not w:
+            return
+        # Quarter turns swap the sides the crop is laid out on
+        shape = (h, w) if self.rotation[row] % 180 != 0 else (w, h)
+        shape_id = self._shape_ids.get(shape)
+        if shape_id is None:
+            shape_id = self._shape_ids[shape] = len(self._shapes)
+            self._shapes.append(shape)
+        self.shape_ids[row] = shape_id
@@ -0,0 +1,124 @@
+import struct
+from PySide6.QtCore import QByteArray
+from PySide6.QtGui import QImage, QTransform
+
+# Thumbnails whose aspect ratio differs more than this from the image are
+# letterboxed (common for 3:2 sensors with 4:3 thumbnails) and not used
+MAX_ASPECT_ERROR = 0.02
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_exif_thumbnail(path):
+    """
+    Reads the JPEG thumbnail embedded in EXIF (APP1, IFD1) from the file
+    header only, without touching image data.
+    Returns (jpeg_bytes, orientation, (width, height)) with the main image's
+    raw size, or None if there is no usable thumbnail.
+    """
+    thumbnail = None
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            header = f.read(4)
+            if len(header) < 4 or header[0] != 0xFF:
+                return None
+            marker = header[1]
+            length = struct.unpack(">H", header[2:])[0]
+            if marker == 0xDA or length < 2:
+                return None  # image data reached without a frame header
+            if marker == 0xE1 and thumbnail is None:
+                segment = f.read(length - 2)
+                if segment.startswith(b"Exif\x00\x00"):
+                    thumbnail = _parse_tiff(segment[6:])
+            elif marker in _SOF_MARKERS:
+                frame = f.read(length - 2)
+                if thumbnail is None or len(frame) < 5:
+                    return None
+                height, width = struct.unpack(">HH", frame[1:5])
+                return thumbnail[0], thumbnail[1], (width, height)
+            else:
+                f.seek(length - 2, 1)
+
+
+def _parse_tiff(tiff):
+    """Returns (jpeg_bytes, orientation) from an EXIF TIFF block, or None."""
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return None
+    endian = "<" if tiff[:2] == b"II" else ">"
+
+    def entries(offset):
+        """Yields (tag, type, count, value field) and finally the next-IFD offset."""
+        count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+        for i in range(count):
+            start = offset + 2 + i * 12
+            yield struct.unpack(endian + "HHI4s", tiff[start:start + 12])
+        yield struct.unpack(endian + "I", tiff[offset + 2 + count * 12:offset + 6 + count * 12])[0]
+
+    def value(type_, raw):
+        # SHORT (3) or LONG (4) stored inline
+        return struct.unpack(endian + ("H" if type_ == 3 else "I"), raw[:2 if type_ == 3 else 4])[0]
+
+    try:
+        orientation = 1
+        ifd1 = 0
+        for item in entries(struct.unpack(endian + "I", tiff[4:8])[0]):
+            if not isinstance(item, tuple):
+                ifd1 = item
+            elif item[0] == 0x0112:
+                orientation = value(item[1], item[3])
+        if not ifd1:
+            return None
+
+        offset = length = None
+        for item in entries(ifd1):
+            if isinstance(item, tuple) and item[0] == 0x0201:
+                offset = value(item[1], item[3])
+            elif isinstance(item, tuple) and item[0] == 0x0202:
+                length = value(item[1], item[3])
+    except struct.error:
+        return None
+
+    if not offset or not length or offset + length > len(tiff):
+        return None
+    data = tiff[offset:offset + length]
+    if not data.startswith(b"\xff\xd8"):
+        return None
+    return data, orientation
+
+
+# EXIF orientation -> (mirror horizontally first, then rotate clockwise degrees)
+_ORIENTATION_TRANSFORMS = {
+    2: (True, 0), 3: (False, 180), 4: (True, 180),
+    5: (True, 270), 6: (False, 90), 7: (True, 90), 8: (False, 270),
+}
+
+
+def exif_preview_image(path):
+    """
+    The embedded EXIF thumbnail of path as an upright QImage, or None if the
+    file has none or it doesn't match the image's aspect ratio.
+    """
+    try:
+        found = read_exif_thumbnail(path)
+    except OSError:
+        return None
+    if not found:
+        return None
+    data, orientation, (width, height) = found
+
+    image = QImage.fromData(QByteArray(data), "JPEG")
+    if image.isNull() or not width or not height:
+        return None
+    if abs(image.width() / image.height() - width / height) > MAX_ASPECT_ERROR * width / height:
+        return None
+
+    mirror, angle = _ORIENTATION_TRANSFORMS.get(orientation, (False, 0))
+    if mirror or angle:
+        transform = QTransform()
+        transform.rotate(angle)
+        if mirror:
+            transform.scale(-1, 1)  # applied before the rotation
+        image = image.transformed(transform)
+    return image
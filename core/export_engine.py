@@ -0,0 +1,165 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from core.memory import system_memory
+from core.processor import process_image, estimate_peak_memory
+
+# Memory budget when the system RAM size is unknown
+FALLBACK_MEMORY_BUDGET = 2 * 1024 ** 3
+
+_pool = None
+_pool_size = 0
+
+
+def get_pool():
+    """Returns the shared export pool, creating it on first use.
+
+    The pool is kept alive between exports so worker processes stay warm
+    and the spawn/import cost is only paid once per session.
+    """
+    global _pool, _pool_size
+    if _pool is None:
+        _pool_size = os.cpu_count() or 1
+        # Always spawn: forking a process that runs Qt threads is unsafe.
+        ctx = multiprocessing.get_context("spawn")
+        _pool = ProcessPoolExecutor(max_workers=_pool_size, mp_context=ctx)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_size
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_size = 0
+
+
+def default_memory_budget():
+    """Half of physical RAM, leaving room for the UI and the rest of the system."""
+    total, _ = system_memory()
+    return total // 2 if total else FALLBACK_MEMORY_BUDGET
+
+
+def estimate_task_memory(task, options):
+    """Estimated peak bytes of exporting task (0 if the header can't be read)."""
+    try:
+        return estimate_peak_memory(task['path'], task['crop'], task.get('rotation', 0),
+                                    task.get('flip_h', False), task.get('flip_v', False),
+                                    options)
+    except Exception:
+        return 0
+
+
+def pick_concurrency(tasks):
+    """Chooses a worker count from the core count; memory is bounded per task by run_export."""
+    cpus = os.cpu_count() or 1
+    return max(1, min(cpus, len(tasks)))
+
+
+def export_task(task, options, decoded=None):
+    """
+    Exports a single task. Module level so it can be pickled to pool workers.
+    Returns (success, stats) where stats holds process_image's encode stats.
+    decoded: optional PIL image of the source already in memory (in-process only).
+    """
+    stats = {}
+    success = process_image(task['path'], task['crop'], task['out_path'],
+                            rotation=task.get('rotation', 0),
+                            flip_h=task.get('flip_h', False),
+                            flip_v=task.get('flip_v', False),
+                            stats=stats,
+                            decoded=decoded,
+                            **options)
+    return success, stats
+
+
+def run_export(tasks, options, workers=None, is_cancelled=lambda: False, memory_budget=None,
+               decoded=None):
+    """
+    Exports tasks and yields (index, task, success, stats) strictly in task order.
+    options: keyword arguments forwarded to process_image (downsample, target_res, ...).
+    workers: number of parallel workers; None picks automatically, 1 runs in-process.
+    memory_budget: bytes the running tasks' estimated peaks may add up to; a task
+        over budget on its own still runs, but alone. None = default_memory_budget().
+    decoded: optional {source path: callable returning a decoded, upright PIL image
+        or None}, e.g. views of the viewer's cache. In-process exports use these
+        instead of decoding from disk; pool workers can't share them and decode.
+    """
+    if workers is None:
+        workers = pick_concurrency(tasks)
+    if not memory_budget:
+        memory_budget = default_memory_budget()
+
+    decoded = decoded or {}
+
+    if workers <= 1:
+        for i, task in enumerate(tasks):
+            if is_cancelled():
+                return
+            source = decoded.get(task['path'])
+            yield (i, task) + export_task(task, options, source() if source else None)
+        return
+
+    pool = get_pool()
+    pending = deque()  # (index, future) in task order
+    next_index = 0
+    estimates = {}  # index -> estimated peak bytes, while submitted
+    next_estimate = None
+
+    try:
+        while next_index < len(tasks) or pending:
+            if is_cancelled():
+                return
+
+            # Keep up to `workers` tasks running while their estimated memory fits
+            # the budget; finished ones wait in `pending` until every earlier task
+            # has been reported.
+            running = [i for i, f in pending if not f.done()]
+            in_use = sum(estimates[i] for i in running)
+            while (next_index < len(tasks) and len(running) < workers
+                   and len(pending) < workers * 4):
+                if next_estimate is None:
+                    next_estimate = estimate_task_memory(tasks[next_index], options)
+                if running and in_use + next_estimate > memory_budget:
+                    break
+                future = pool.submit(export_task, tasks[next_index], options)
+                pending.append((next_index, future))
+                estimates[next_index] = next_estimate
+                running.append(next_index)
+                in_use += next_estimate
+                next_index += 1
+                next_estimate = None
+
+            index, future = pending[0]
+            if not future.done():
+                # Short timeout keeps cancellation responsive
+                wait([f for _, f in pending if not f.done()], timeout=0.1,
+                     return_when=FIRST_COMPLETED)
+                continue
+
+            try:
+                success, stats = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                print(f"Error processing {tasks[index]['path']}: {e}")
+                success, stats = False, {}
+            pending.popleft()
+            estimates.pop(index, None)
+            yield index, tasks[index], success, stats
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory). Drop the pool and finish in-process.
+        print("Export pool failed, continuing without parallelism")
+        shutdown_pool()
+        remaining = [i for i, _ in pending] + list(range(next_index, len(tasks)))
+        pending.clear()
+        for i in remaining:
+            if is_cancelled():
+                return
+            source = decoded.get(tasks[i]['path'])
+            yield (i, tasks[i]) + export_task(tasks[i], options, source() if source else None)
+    finally:
+        for _, future in pending:
+            future.cancel()
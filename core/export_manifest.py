@@ -0,0 +1,105 @@
+import os
+import json
+from core.processor import resolve_variants
+
+MANIFEST_NAME = ".quickcrop_manifest.json"
+# Bump when process_image output changes so stale manifests force a re-export
+MANIFEST_VERSION = 1
+
+
+class ExportManifest:
+    """
+    Records what produced each file in an output folder so unchanged
+    images can be skipped on the next export.
+    Entries are keyed by output path relative to the folder and hold a
+    fingerprint of the source file (path, mtime, size) and every export parameter.
+    """
+
+    def __init__(self, output_dir, entries=None):
+        self.output_dir = output_dir
+        self.entries = entries or {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, output_dir):
+        path = os.path.join(output_dir, MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                return cls(output_dir, data.get('entries', {}))
+        except (OSError, ValueError, AttributeError):
+            pass
+        return cls(output_dir)
+
+    def save(self):
+        if not self._dirty:
+            return
+        path = os.path.join(self.output_dir, MANIFEST_NAME)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({'version': MANIFEST_VERSION, 'entries': self.entries}, f)
+            os.replace(tmp_path, path)
+            self._dirty = False
+        except OSError as e:
+            print(f"Could not write export manifest {path}: {e}")
+
+    def _key(self, out_path):
+        return os.path.relpath(os.path.abspath(out_path), os.path.abspath(self.output_dir))
+
+    @staticmethod
+    def fingerprint(task, options):
+        """Everything that influences the output file; None if the source is unreadable."""
+        try:
+            st = os.stat(task['path'])
+        except OSError:
+            return None
+        return {
+            'source': os.path.abspath(task['path']),
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'crop': [round(float(v), 6) for v in task['crop']],
+            'rotation': round(float(task.get('rotation', 0)), 6),
+            'flip_h': bool(task.get('flip_h', False)),
+            'flip_v': bool(task.get('flip_v', False)),
+            'options': {k: options[k] for k in sorted(options)},
+        }
+
+    def is_current(self, task, options):
+        """True if every output exists and was produced from identical inputs."""
+        current = _as_json(self.fingerprint(task, options))
+        if current is None:
+            return False
+        for out in resolve_variants(task['out_path'], options):
+            entry = self.entries.get(self._key(out['out_path']))
+            if not entry or entry.get('fingerprint') != current:
+                return False
+            try:
+                out_size = os.path.getsize(out['out_path'])
+            except OSError:
+                return False
+            if out_size != entry.get('output_size'):
+                return False
+        return True
+
+    def record(self, task, options):
+        fingerprint = self.fingerprint(task, options)
+        if fingerprint is None:
+            return
+        fingerprint = _as_json(fingerprint)
+        for out in resolve_variants(task['out_path'], options):
+            try:
+                out_size = os.path.getsize(out['out_path'])
+            except OSError:
+                continue
+            self.entries[self._key(out['out_path'])] = {
+                'fingerprint': fingerprint,
+                'output_size': out_size,
+            }
+            self._dirty = True
+
+
+def _as_json(value):
+    """Round-trip through JSON so tuples and lists compare equal."""
+    return json.loads(json.dumps(value))
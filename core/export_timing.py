@@ -0,0 +1,70 @@
+import json
+import time
+from collections import deque
+from core.processor import STAGES
+
+TIMING_REPORT_NAME = "quickcrop_timings.jsonl"
+
+
+class ThroughputMeter:
+    """Rolling images/s and MB/s over the last `window` seconds of an export."""
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.start = time.perf_counter()
+        self.samples = deque()  # (timestamp, bytes written) inside the window
+        self.count = 0
+        self.total_bytes = 0
+
+    def add(self, nbytes, now=None):
+        now = time.perf_counter() if now is None else now
+        self.samples.append((now, nbytes))
+        self.count += 1
+        self.total_bytes += nbytes
+        while self.samples and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    def rates(self, now=None):
+        """Returns (images per second, MB per second)."""
+        now = time.perf_counter() if now is None else now
+        recent = [(t, b) for t, b in self.samples if now - t <= self.window]
+        if recent and now - self.start > self.window:
+            count, nbytes, elapsed = len(recent), sum(b for _, b in recent), self.window
+        else:
+            # Early on, or images slower than the window: use the overall average
+            count, nbytes, elapsed = self.count, self.total_bytes, now - self.start
+        elapsed = max(1e-6, elapsed)
+        return count / elapsed, nbytes / (1024 * 1024) / elapsed
+
+    def eta(self, remaining, now=None):
+        """Seconds until `remaining` images are done, or None if unknown."""
+        images_per_s, _ = self.rates(now)
+        if images_per_s <= 0:
+            return None
+        return remaining / images_per_s
+
+
+def stage_totals(records):
+    """Sums per-stage seconds over timing records, in STAGES order."""
+    totals = {stage: 0.0 for stage in STAGES}
+    for record in records:
+        for stage, seconds in record.get('timings', {}).items():
+            totals[stage] = totals.get(stage, 0.0) + seconds
+    return totals
+
+
+def timing_record(task, success, stats):
+    """One JSON-serializable report line for an exported task."""
+    return {
+        'path': task['path'],
+        'out_path': task['out_path'],
+        'success': bool(success),
+        'bytes': stats.get('bytes', 0),
+        'timings': {k: round(v, 6) for k, v in stats.get('timings', {}).items()},
+    }
+
+
+def write_timing_report(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
@@ -1,119 +1,294 @@
-from PySide6.QtCore import QObject, Signal, QThreadPool
+import sys
+from collections import OrderedDict
+from PySide6.QtCore import QObject, Signal, QTimer
 from PySide6.QtGui import QImage
-from ui.image_loader_worker import ImageLoaderWorker
+from PIL import Image
+from core.decode_service import DecodeService
+from core.metrics import metrics
+from core.memory import system_memory
+from core.prefetch import PrefetchPlanner
+
+# QImage formats Pillow can wrap in place: format -> PIL mode
+_SHARED_FORMATS = {
+    QImage.Format.Format_RGBA8888: "RGBA",
+    QImage.Format.Format_Grayscale8: "L",
+}
+# Formats that need one unpacking copy: format -> (PIL mode, raw mode).
+# RGB32/ARGB32 are native-endian 32-bit words.
+_LITTLE_ENDIAN = sys.byteorder == "little"
+_UNPACKED_FORMATS = {
+    QImage.Format.Format_RGBX8888: ("RGB", "RGBX"),
+    QImage.Format.Format_RGB32: ("RGB", "BGRX" if _LITTLE_ENDIAN else "XRGB"),
+    QImage.Format.Format_ARGB32: ("RGBA", "BGRA" if _LITTLE_ENDIAN else "ARGB"),
+}
+if _LITTLE_ENDIAN:
+    # Display-ready images with alpha (see decode_service.display_ready)
+    _UNPACKED_FORMATS[QImage.Format.Format_ARGB32_Premultiplied] = ("RGBA", "BGRa")
+
+
+def pil_image(qimage):
+    """
+    PIL image of a decoded QImage for export, or None if its format can't be
+    bridged. RGBA8888/Grayscale8 share the QImage's pixels (keep the QImage
+    alive while the result is used); 32-bit formats are unpacked once.
+    """
+    if qimage is None or qimage.isNull():
+        return None
+    fmt = qimage.format()
+    size = (qimage.width(), qimage.height())
+    if fmt in _SHARED_FORMATS:
+        mode = rawmode = _SHARED_FORMATS[fmt]
+    elif fmt in _UNPACKED_FORMATS:
+        mode, rawmode = _UNPACKED_FORMATS[fmt]
+    else:
+        return None
+    return Image.frombuffer(mode, size, qimage.constBits(), "raw", rawmode,
+                            qimage.bytesPerLine(), 1)
+
+
+# Longest side of display proxies
+PROXY_SIZE = 2560
+# Cache budget when system memory is unknown
+DEFAULT_BYTE_BUDGET = 1024 * 1024 * 1024
+# Free memory below which the cache gives memory back: max(bytes, fraction of RAM)
+PRESSURE_FLOOR_BYTES = 512 * 1024 * 1024
+PRESSURE_FLOOR_FRACTION = 0.10
+PRESSURE_CHECK_MS = 2000
+
+
+def default_byte_budget():
+    """A quarter of physical RAM, capped at DEFAULT_BYTE_BUDGET."""
+    total, _ = system_memory()
+    if not total:
+        return DEFAULT_BYTE_BUDGET
+    return min(DEFAULT_BYTE_BUDGET, total // 4)
+
 
 class ImageCache(QObject):
     image_ready = Signal(str, QImage, bool) # path, image, is_full
+    preview_ready = Signal(str, QImage)      # path, EXIF thumbnail of the displayed image
     
-    def __init__(self, proxy_window=10, proxy_size=2560):
+    def __init__(self, proxy_window=10, proxy_size=PROXY_SIZE, byte_budget=None, decode_service=None):
         super().__init__()
         self.proxy_window = proxy_window
         self.proxy_size = proxy_size
+        # Shared with the camera roll so both read each file once
+        self.decode_service = decode_service or DecodeService(self, proxy_size=proxy_size)
+        self.planner = PrefetchPlanner(proxy_window)
         
         self.proxies = {}  # path -> QImage
         self.full_images = {} # path -> QImage
         
-        self.thread_pool = QThreadPool.globalInstance()
-        self.loading_paths = set() # (path, is_proxy)
-        self.active_workers = {}   # (path, is_proxy) -> worker
+        # LRU over both tiers, each entry charged its real size
+        self._lru = OrderedDict()  # (path, is_full) -> bytes, least recently used first
+        self.bytes_used = 0
+        self.byte_budget = byte_budget or default_byte_budget()
+        self._pinned = set()  # entries of the displayed image, never evicted
+        self._current = None  # path of the displayed image
+        self.hits = 0
+        self.misses = 0
+        
+        self.active_loads = {}     # (path, is_proxy) -> queued or running DecodeRequest
+        self._wanted = {}          # (path, is_proxy) -> priority for the current window
+        self.dropped_results = 0   # decodes finished after leaving the window
+        self.decode_seconds = {}   # path -> decode time of its last delivered image
+        self.full_sizes = {}       # path -> upright QSize of the source
+        
+        self._pressure_timer = QTimer(self)
+        self._pressure_timer.setInterval(PRESSURE_CHECK_MS)
+        self._pressure_timer.timeout.connect(self.check_memory_pressure)
+        if system_memory()[1] is not None:
+            self._pressure_timer.start()
         
     def get_image(self, path):
         """Returns (image, is_full) if cached, otherwise (None, False)."""
-        if path in self.full_images:
-            return self.full_images[path], True
-        if path in self.proxies:
-            return self.proxies[path], False
+        for is_full, tier in ((True, self.full_images), (False, self.proxies)):
+            if path in tier:
+                self.hits += 1
+                metrics.count('cache.hits')
+                self._lru.move_to_end((path, is_full))
+                return tier[path], is_full
+        self.misses += 1
+        metrics.count('cache.misses')
         return None, False
+
+    def get_full_image(self, path):
+        """Returns the cached full-quality QImage for path, or None. Not counted in stats."""
+        return self.full_images.get(path)
+
+    def cached_image(self, path, max_dim):
+        """
+        Smallest cached image of path whose longest side is at least max_dim,
+        a function of the full size like DecodeRequest.max_dim (None: full
+        resolution). Returns (image, full_size), or (None, None). Not counted in stats.
+        """
+        full_size = self.full_sizes.get(path)
+        if full_size is None:
+            return None, None
+        needed = max_dim(full_size) if callable(max_dim) else max_dim
+        for image in (self.proxies.get(path), self.full_images.get(path)):
+            if image is None:
+                continue
+            longest = max(image.width(), image.height())
+            if (needed is None and image.size() == full_size) or (needed is not None and longest >= needed):
+                return image, full_size
+        return None, None
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate(),
+            'bytes_used': self.bytes_used,
+            'byte_budget': self.byte_budget,
+            'entries': len(self._lru),
+            'queued_loads': len(self.active_loads),
+            'dropped_results': self.dropped_results,
+        }
+
+    def set_byte_budget(self, byte_budget):
+        self.byte_budget = byte_budget or default_byte_budget()
+        self._evict(self.byte_budget)
+
+    def check_memory_pressure(self):
+        """Gives memory back when the system runs low: evicts until free RAM is above the floor."""
+        total, available = system_memory()
+        if available is None:
+            return
+        floor = max(PRESSURE_FLOOR_BYTES, int((total or 0) * PRESSURE_FLOOR_FRACTION))
+        if available < floor:
+            self._evict(max(0, self.bytes_used - (floor - available)))
         
-    def update_window(self, current_path, all_paths):
-        """Updates the pre-loading window and evicts old images."""
-        if current_path not in all_paths:
+    def update_window(self, current_path, image_set):
+        """
+        Updates the pre-loading window around current_path in image_set (an
+        ImageSet). Memory is reclaimed by LRU eviction, not by the window.
+        """
+        idx = image_set.row_of(current_path)
+        if idx is None:
             return
             
-        idx = all_paths.index(current_path)
+        self._pinned = {(current_path, True), (current_path, False)}
+        self._current = current_path
         
-        # 1. Full Image Window (Current + Next)
-        full_needed = {current_path}
-        if idx + 1 < len(all_paths):
-            full_needed.add(all_paths[idx+1])
-            
-        # 2. Proxy Window (Larger)
-        start = max(0, idx - self.proxy_window)
-        end = min(len(all_paths), idx + self.proxy_window + 1)
-        proxies_needed = set(all_paths[start:end])
+        # Current image first, then full images ahead, then proxies by
+        # distance, shaped by navigation direction/speed (see PrefetchPlanner)
+        plan = self.planner.plan(idx, len(image_set))
+        self._schedule({(image_set.path_at(i), is_proxy): priority
+                        for (i, is_proxy), priority in plan.items()})
+
+    def record_navigation(self, step):
+        """Feeds a navigation move (+n forward, -n back) to the prefetch planner."""
+        self.planner.record_step(step)
+
+    def _schedule(self, wanted):
+        """
+        Makes the load queue match `wanted`: drops queued loads that are no
+        longer wanted, re-queues the rest at their new priority and starts
+        loads for entries that aren't cached yet.
+        """
+        self._wanted = wanted
+        for load_key, request in list(self.active_loads.items()):
+            priority = wanted.get(load_key)
+            if priority == request.priority:
+                continue
+            # Only queued work can be moved or taken back; a running decode
+            # finishes and its result is dropped in _on_load_finished if unwanted
+            if priority is not None:
+                self.decode_service.set_priority(request, priority)
+            elif self.decode_service.cancel(request):
+                del self.active_loads[load_key]
         
-        # Evict old full images
-        to_evict_full = [p for p in self.full_images if p not in full_needed]
-        for p in to_evict_full:
-            del self.full_images[p]
-            
-        # Evict old proxies
-        to_evict_proxy = [p for p in self.proxies if p not in proxies_needed]
-        for p in to_evict_proxy:
-            del self.proxies[p]
-            
-        # Trigger Loads
-        # Prioritize current full image
-        if current_path not in self.full_images:
-            self._load_image(current_path, is_proxy=False)
-            
-        # Load next full image
-        if idx + 1 < len(all_paths):
-            next_path = all_paths[idx+1]
-            if next_path not in self.full_images:
-                self._load_image(next_path, is_proxy=False)
-
-        # Load proxies
-        for path in proxies_needed:
-            if path not in self.proxies:
-                self._load_image(path, is_proxy=True)
-
-    def _load_image(self, path, is_proxy=True):
+        missing = [(load_key, priority)
+                   for load_key, priority in sorted(wanted.items(), key=lambda kv: -kv[1])
+                   if load_key[0] not in (self.proxies if load_key[1] else self.full_images)]
+        # Reads first, so decodes can wait for their bytes instead of reading themselves
+        self.decode_service.schedule_read_ahead([load_key for load_key, _ in missing])
+        for (path, is_proxy), priority in missing:
+            self._load_image(path, is_proxy, priority)
+
+    def _store(self, path, image, is_full):
+        key = (path, is_full)
+        tier = self.full_images if is_full else self.proxies
+        if key in self._lru:
+            self.bytes_used -= self._lru.pop(key)
+        tier[path] = image
+        self._lru[key] = image.sizeInBytes()
+        self.bytes_used += self._lru[key]
+        self._evict(self.byte_budget)
+
+    def _evict(self, target_bytes):
+        """Drops least recently used, unpinned entries until bytes_used <= target_bytes."""
+        for key in list(self._lru):
+            if self.bytes_used <= target_bytes:
+                break
+            if key in self._pinned:
+                continue
+            path, is_full = key
+            self.bytes_used -= self._lru.pop(key)
+            del (self.full_images if is_full else self.proxies)[path]
+            metrics.count('cache.evictions')
+        metrics.gauge('cache.bytes', self.bytes_used)
+        metrics.gauge('cache.entries', len(self._lru))
+
+    def _load_image(self, path, is_proxy=True, priority=0):
         load_key = (path, is_proxy)
-        if load_key in self.loading_paths:
+        # The displayed image's proxy load brings its EXIF thumbnail first
+        # (lowest tier, see preview_ready), read on the decode thread
+        use_preview = is_proxy and path == self._current and path not in self.full_images
+        active = self.active_loads.get(load_key)
+        if active is not None:
+            # Already queued (and moved to its priority by _schedule)
+            if use_preview and not active.use_preview:
+                self.decode_service.add_preview(active)
             return
-            
-        self.loading_paths.add(load_key)
         
+        # A proxy and full request queued together share one full decode
         max_dim = self.proxy_size if is_proxy else None
-        worker = ImageLoaderWorker(path, max_dim=max_dim, is_proxy=is_proxy)
-        
-        # Keep reference to prevent GC in PySide6
-        self.active_workers[load_key] = worker
-        
-        # Connect signals
-        worker.signals.finished.connect(self._on_load_finished)
-        worker.signals.error.connect(self._on_load_error)
+        self.active_loads[load_key] = self.decode_service.request(
+            path, max_dim=max_dim, priority=priority, use_preview=use_preview, buffered=True,
+            callback=lambda request, image, is_final: self._on_load_finished(request, image, is_final, is_proxy))
+
+    def _on_load_finished(self, request, image, is_final, is_proxy):
+        if not is_final:
+            # The EXIF thumbnail ahead of the decode: shown, never cached
+            if image is not None and request.path == self._current:
+                self.preview_ready.emit(request.path, image)
+            return
+        load_key = (request.path, is_proxy)
+        if self.active_loads.get(load_key) is request:
+            del self.active_loads[load_key]
+        if image is None:
+            print(f"Error loading {request.path}: {request.error}")
+            return
+        if request.decode_s is not None:
+            self.planner.record_decode(is_proxy, request.decode_s)
         
-        self.thread_pool.start(worker)
-
-    def _on_load_finished(self, path, image, is_full_quality):
-        # Infer is_proxy (since we don't have it in signal)
-        # Check both full and proxy just in case
-        for requested_proxy in [True, False]:
-            load_key = (path, requested_proxy)
-            if load_key in self.active_workers:
-                del self.active_workers[load_key]
-            if load_key in self.loading_paths:
-                self.loading_paths.remove(load_key)
+        # The window moved on while this was decoding
+        if load_key not in self._wanted:
+            self.dropped_results += 1
+            metrics.count('cache.dropped_results')
+            return
             
-        if is_full_quality:
-            self.full_images[path] = image
-        else:
-            self.proxies[path] = image
+        is_full_quality = image.size() == request.full_size
+        self.decode_seconds[request.path] = request.decode_s
+        self.full_sizes[request.path] = request.full_size
+        self._store(request.path, image, is_full_quality)
             
-        self.image_ready.emit(path, image, is_full_quality)
-
-    def _on_load_error(self, path, error_msg):
-        for requested_proxy in [True, False]:
-            load_key = (path, requested_proxy)
-            if load_key in self.active_workers:
-                del self.active_workers[load_key]
-            if load_key in self.loading_paths:
-                self.loading_paths.remove(load_key)
-        print(f"Error loading {path}: {error_msg}")
+        self.image_ready.emit(request.path, image, is_full_quality)
 
     def clear(self):
         self.proxies.clear()
         self.full_images.clear()
-        self.loading_paths.clear()
+        self._lru.clear()
+        self._pinned.clear()
+        self._current = None
+        self.decode_seconds.clear()
+        self.full_sizes.clear()
+        self.bytes_used = 0
+        self._evict(0)  # updates the gauges
+        self._schedule({})
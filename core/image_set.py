@@ -0,0 +1,317 @@
+import os
+import random
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+# Item data roles, shared by the views over an ImageSet
+PATH_ROLE = 100
+HIDDEN_ROLE = 101
+
+
+class _Node:
+    """An image in the order; also a subtree of the treap rooted at it."""
+    __slots__ = ("path", "hidden", "priority", "size", "visible", "left", "right", "parent")
+
+    def __init__(self, path):
+        self.path = path
+        self.hidden = False
+        self.priority = random.random()
+        self.size = 1      # nodes in this subtree
+        self.visible = 1   # of which not hidden
+        self.left = None
+        self.right = None
+        self.parent = None
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _visible(node):
+    return node.visible if node is not None else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    node.visible = (not node.hidden) + _visible(node.left) + _visible(node.right)
+
+
+def _merge(a, b):
+    """Treap of a's nodes followed by b's."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.priority > b.priority:
+        a.right = _merge(a.right, b)
+        a.right.parent = a
+        _update(a)
+        return a
+    b.left = _merge(a, b.left)
+    b.left.parent = b
+    _update(b)
+    return b
+
+
+def _split(node, k):
+    """(first k nodes, the rest) of node's subtree."""
+    if node is None:
+        return None, None
+    if _size(node.left) >= k:
+        left, node.left = _split(node.left, k)
+        if node.left is not None:
+            node.left.parent = node
+        _update(node)
+        return left, node
+    node.right, right = _split(node.right, k - _size(node.left) - 1)
+    if node.right is not None:
+        node.right.parent = node
+    _update(node)
+    return node, right
+
+
+def _build(nodes):
+    """Treap of nodes in order, in linear time (the Cartesian tree of their priorities)."""
+    spine = []  # right spine, root first
+    for node in nodes:
+        last = None
+        while spine and spine[-1].priority < node.priority:
+            last = spine.pop()
+            _update(last)
+        node.left = last
+        if last is not None:
+            last.parent = node
+        if spine:
+            spine[-1].right = node
+            node.parent = spine[-1]
+        spine.append(node)
+    for node in reversed(spine):
+        _update(node)
+    return spine[0] if spine else None
+
+
+class ImageSet(QAbstractListModel):
+    """
+    The loaded images in display order, each possibly hidden (skipped). The
+    image list, camera roll and main window all work on this one order; the
+    views follow it through the usual row signals.
+
+    Kept as a treap over positions, so rank lookups, inserts, removals,
+    moves and stepping over hidden images are O(log n).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = None
+        self._nodes = {}  # path -> _Node
+
+    # ── Queries ──
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, path):
+        return path in self._nodes
+
+    def __iter__(self):
+        return iter(self.paths())
+
+    def paths(self, start=0, stop=None):
+        """Paths of rows start..stop-1 in order."""
+        stop = len(self._nodes) if stop is None else min(stop, len(self._nodes))
+        result = []
+        if start >= stop:
+            return result
+        # Descend to row start, remembering the ancestors still to visit
+        stack = []
+        node, k = self._root, start
+        while node is not None:
+            left = _size(node.left)
+            if k < left:
+                stack.append(node)
+                node = node.left
+            elif k == left:
+                stack.append(node)
+                break
+            else:
+                k -= left + 1
+                node = node.right
+        while stack and len(result) < stop - start:
+            node = stack.pop()
+            result.append(node.path)
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+        return result
+
+    def path_at(self, row):
+        node = self._node_at(row)
+        return node.path if node is not None else None
+
+    def row_of(self, path):
+        """Row of path, or None if it isn't in the set."""
+        node = self._nodes.get(path)
+        if node is None:
+            return None
+        row = _size(node.left)
+        while node.parent is not None:
+            if node is node.parent.right:
+                row += _size(node.parent.left) + 1
+            node = node.parent
+        return row
+
+    def is_hidden(self, path):
+        node = self._nodes.get(path)
+        return node is not None and node.hidden
+
+    def hidden_at(self, row):
+        """is_hidden by row, for views sizing every row on a layout pass."""
+        node = self._node_at(row)
+        return node is not None and node.hidden
+
+    def visible_count(self):
+        return _visible(self._root)
+
+    def step_visible(self, row, steps):
+        """
+        Row of the image `steps` visible images after row (before it if
+        negative), wrapping around; hidden rows aren't counted. None if no
+        image is visible.
+        """
+        total = self.visible_count()
+        if total == 0:
+            return None
+        # Visible images up to and including row, or strictly before it
+        if steps > 0:
+            target = self._visible_before(row + 1) + steps - 1
+        else:
+            target = self._visible_before(row) + steps
+        return self._visible_row(target % total)
+
+    def _node_at(self, row):
+        node = self._root
+        while node is not None:
+            left = _size(node.left)
+            if row < left:
+                node = node.left
+            elif row == left:
+                return node
+            else:
+                row -= left + 1
+                node = node.right
+        return None
+
+    def _visible_before(self, row):
+        """Visible images in rows 0..row-1."""
+        count = 0
+        node = self._root
+        while node is not None and row > 0:
+            left = _size(node.left)
+            if row <= left:
+                node = node.left
+            else:
+                count += _visible(node.left) + (not node.hidden)
+                row -= left + 1
+                node = node.right
+        return count
+
+    def _visible_row(self, k):
+        """Row of the k-th visible image."""
+        row = 0
+        node = self._root
+        while node is not None:
+            left = _visible(node.left)
+            if k < left:
+                node = node.left
+            elif k == left and not node.hidden:
+                return row + _size(node.left)
+            else:
+                k -= left + (not node.hidden)
+                row += _size(node.left) + 1
+                node = node.right
+        return None
+
+    # ── Changes ──
+
+    def extend(self, paths):
+        """Appends the paths not in the set yet, in one insert. Returns those paths."""
+        added = []
+        for path in paths:
+            if path not in self._nodes:
+                self._nodes[path] = _Node(path)
+                added.append(path)
+        if added:
+            first = _size(self._root)
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            self._root = self._join(self._root, _build([self._nodes[path] for path in added]))
+            self.endInsertRows()
+        return added
+
+    def remove(self, path):
+        row = self.row_of(path)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        before, rest = _split(self._root, row)
+        _, after = _split(rest, 1)
+        del self._nodes[path]
+        self._root = self._join(before, after)
+        self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._root = None
+        self._nodes = {}
+        self.endResetModel()
+
+    def set_hidden(self, path, hidden):
+        node = self._nodes.get(path)
+        if node is None or node.hidden == hidden:
+            return
+        node.hidden = hidden
+        while node is not None:
+            _update(node)
+            node = node.parent
+        index = self.index(self.row_of(path))
+        self.dataChanged.emit(index, index, [HIDDEN_ROLE])
+
+    def moveRows(self, source_parent, source_row, count, dest_parent, dest_row):
+        if source_parent.isValid() or dest_parent.isValid() or count <= 0:
+            return False
+        if source_row <= dest_row <= source_row + count:
+            return False  # onto itself
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1, QModelIndex(), dest_row):
+            return False
+        before, rest = _split(self._root, source_row)
+        moved, after = _split(rest, count)
+        remaining = self._join(before, after)
+        if dest_row > source_row:
+            dest_row -= count
+        before, after = _split(remaining, dest_row)
+        self._root = self._join(self._join(before, moved), after)
+        self.endMoveRows()
+        return True
+
+    @staticmethod
+    def _join(a, b):
+        root = _merge(a, b)
+        if root is not None:
+            root.parent = None
+        return root
+
+    # ── Model ──
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._nodes)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        node = self._node_at(index.row()) if index.isValid() else None
+        if node is None:
+            return None
+        if role == PATH_ROLE:
+            return node.path
+        if role == HIDDEN_ROLE:
+            return node.hidden
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return os.path.basename(node.path)
+        return None
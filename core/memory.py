@@ -0,0 +1,50 @@
+import os
+import sys
+
+
+def system_memory():
+    """
+    Returns (total, available) physical memory in bytes. Either value is None
+    when the platform doesn't report it.
+    """
+    if sys.platform.startswith("linux"):
+        try:
+            info = {}
+            with open("/proc/meminfo", "r") as f:
+                for line in f:
+                    key, value = line.split(":", 1)
+                    info[key] = int(value.split()[0]) * 1024  # reported in kB
+            return info.get("MemTotal"), info.get("MemAvailable")
+        except (OSError, ValueError):
+            pass
+    elif sys.platform == "win32":
+        try:
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong),
+                            ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong),
+                            ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong),
+                            ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong),
+                            ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullTotalPhys, status.ullAvailPhys
+        except (OSError, AttributeError):
+            pass
+
+    # Other POSIX (macOS): total is reliable, available often isn't exposed
+    total = available = None
+    try:
+        page = os.sysconf("SC_PAGE_SIZE")
+        total = os.sysconf("SC_PHYS_PAGES") * page
+        available = os.sysconf("SC_AVPHYS_PAGES") * page
+    except (AttributeError, ValueError, OSError):
+        pass
+    return total, available
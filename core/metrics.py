@@ -0,0 +1,107 @@
+import json
+import threading
+from collections import deque
+
+# Samples kept per histogram and navigations kept for the HUD / JSON export
+MAX_SAMPLES = 1000
+MAX_NAVIGATIONS = 200
+
+
+class Histogram:
+    """Count, sum and extremes of a timing plus its recent samples for percentiles."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """
+    Counters, gauges and timing histograms shared by the loaders, cache and
+    viewer, plus a log of recent navigations. Thread-safe; names are dotted
+    ("decode.seconds") and timings are in seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.navigations = deque(maxlen=MAX_NAVIGATIONS)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def record_navigation(self, record):
+        """record: dict describing one image shown, see MainWindow._begin_navigation."""
+        with self._lock:
+            self.navigations.append(dict(record))
+
+    def last_navigation(self):
+        with self._lock:
+            return dict(self.navigations[-1]) if self.navigations else None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {name: h.as_dict() for name, h in self.histograms.items()},
+                'navigations': list(self.navigations),
+            }
+
+    def write_json(self, path, extra=None):
+        data = self.snapshot()
+        if extra:
+            data.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, default=str)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.navigations.clear()
+
+
+# Shared by everything in the viewer process
+metrics = Metrics()
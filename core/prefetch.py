@@ -0,0 +1,113 @@
+import math
+import time
+
+# Seconds without navigation after which the user counts as idle
+IDLE_SECONDS = 1.0
+# Consecutive steps in one direction that count as steady browsing
+STEADY_STEPS = 3
+# Weight of the newest sample in the moving averages
+SMOOTHING = 0.3
+# Proxy lookahead covers this many decode latencies of travel
+LATENCY_MARGIN = 4
+MAX_PROXY_AHEAD = 60
+MAX_FULL_AHEAD = 3
+
+# Load queue priorities (QThreadPool runs higher first)
+PRIORITY_CURRENT = 1000
+PRIORITY_NEXT_FULL = 900
+PRIORITY_PROXY = 800
+
+
+class PrefetchPlanner:
+    """
+    Decides which images the viewer cache should load around the current one.
+    Tracks navigation direction and speed plus measured decode latency, and
+    turns them into an uneven window: deeper ahead than behind while moving,
+    more full-resolution images ahead when browsing steadily, and the image
+    just left after a reversal.
+    """
+
+    def __init__(self, proxy_window=15, proxy_latency=0.08, full_latency=0.3):
+        self.proxy_window = proxy_window
+        self.latency = {True: proxy_latency, False: full_latency}  # is_proxy -> seconds
+        self.direction = 0
+        self.velocity = 0.0  # images per second
+        self.streak = 0      # consecutive steps in self.direction
+        self.reversed = False
+        self._last_step = None
+
+    def record_step(self, step, now=None):
+        """Called for every navigation move; step is signed (+n forward, -n back)."""
+        if step == 0:
+            return
+        now = time.perf_counter() if now is None else now
+        direction = 1 if step > 0 else -1
+
+        if self._last_step is not None and now - self._last_step < IDLE_SECONDS:
+            rate = abs(step) / max(0.01, now - self._last_step)
+            self.velocity += SMOOTHING * (rate - self.velocity)
+        else:
+            self.velocity = 0.0
+
+        if direction == self.direction:
+            self.streak += 1
+            if self.streak >= STEADY_STEPS:
+                self.reversed = False
+        else:
+            self.reversed = self.direction != 0
+            self.direction = direction
+            self.streak = 1
+        self._last_step = now
+
+    def record_decode(self, is_proxy, seconds):
+        self.latency[is_proxy] += SMOOTHING * (seconds - self.latency[is_proxy])
+
+    def is_moving(self, now=None):
+        now = time.perf_counter() if now is None else now
+        return self._last_step is not None and now - self._last_step < IDLE_SECONDS
+
+    def plan(self, index, count, now=None):
+        """Returns {(index, is_proxy): priority} for the images worth loading."""
+        wanted = {
+            (index, False): PRIORITY_CURRENT,
+            (index, True): PRIORITY_CURRENT - 1,
+        }
+
+        if not self.is_moving(now) or self.direction == 0:
+            # Idle: symmetric proxies, the next full image
+            direction = 1
+            ahead = behind = self.proxy_window
+            full_ahead = 1
+        else:
+            direction = self.direction
+            travel = self.velocity * self.latency[True] * LATENCY_MARGIN
+            ahead = min(MAX_PROXY_AHEAD, self.proxy_window + math.ceil(travel))
+            behind = max(1, self.proxy_window // 3)
+            full_ahead = 1
+            if self.streak >= STEADY_STEPS:
+                # Images passed while one full decode runs; past a few,
+                # full prefetch can't keep up and only the next one is worth it
+                passed = self.velocity * self.latency[False]
+                if passed <= MAX_FULL_AHEAD:
+                    full_ahead = min(MAX_FULL_AHEAD, 2 + int(passed >= 1))
+
+        for k in range(1, full_ahead + 1):
+            i = index + direction * k
+            if 0 <= i < count:
+                wanted[(i, False)] = PRIORITY_NEXT_FULL - k
+        if self.reversed and self.is_moving(now):
+            # Likely to flip back to where they came from
+            i = index - direction
+            if 0 <= i < count:
+                wanted.setdefault((i, False), PRIORITY_NEXT_FULL - MAX_FULL_AHEAD - 1)
+
+        for k in range(1, ahead + 1):
+            i = index + direction * k
+            if 0 <= i < count:
+                wanted.setdefault((i, True), PRIORITY_PROXY - k)
+        for k in range(1, behind + 1):
+            i = index - direction * k
+            if 0 <= i < count:
+                # Behind loads after the same distance ahead
+                wanted.setdefault((i, True), PRIORITY_PROXY - 2 * k)
+        return wanted
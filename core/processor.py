@@ -1,88 +1,181 @@
-from PIL import Image, ImageOps
+from PIL import Image, ImageChops, ImageOps
+import io
 import os
 import math
+import time
+
+# EXIF orientation (tag 0x0112) -> affine mapping upright coords to raw coords,
+# written as (a, b, c, d, e, f) with c/f in units of the raw (w, h).
+# Mirrors the transposes ImageOps.exif_transpose would apply.
+_ORIENTATION_MAPS = {
+    2: lambda w, h: (-1, 0, w, 0, 1, 0),
+    3: lambda w, h: (-1, 0, w, 0, -1, h),
+    4: lambda w, h: (1, 0, 0, 0, -1, h),
+    5: lambda w, h: (0, 1, 0, 1, 0, 0),
+    6: lambda w, h: (0, 1, 0, -1, 0, h),
+    7: lambda w, h: (0, -1, w, -1, 0, h),
+    8: lambda w, h: (0, -1, w, 1, 0, 0),
+}
+
+# Output encoders. "Original" keeps the source format.
+ENCODERS = ["Original", "JPEG Baseline", "JPEG Progressive", "JPEG Optimized", "WebP", "PNG"]
+_ENCODER_FORMATS = {
+    "JPEG Baseline": "JPEG",
+    "JPEG Progressive": "JPEG",
+    "JPEG Optimized": "JPEG",
+    "WebP": "WEBP",
+    "PNG": "PNG",
+}
+_FORMAT_EXTENSIONS = {
+    "JPEG": (".jpg", ".jpeg"),
+    "WEBP": (".webp",),
+    "PNG": (".png",),
+}
+
+# Speed/size presets: preset -> (quality, WebP method, PNG compress_level).
+# "Max Quality" with the "Original" encoder reproduces the classic quality=100 save.
+ENCODER_PRESETS = {
+    "Max Quality": (100, 4, 6),
+    "Fast": (92, 0, 1),
+    "Balanced": (90, 4, 6),
+    "Small": (80, 6, 9),
+}
+
+# Lowest quality the target-size search may fall back to
+MIN_TARGET_QUALITY = 5
+
+# Pipeline stages timed per image (stats['timings'])
+STAGES = ("open", "decode", "transform", "resize", "encode", "write")
+
 
 def process_image(source_path: str, normalized_crop: tuple, output_path: str, 
                   downsample: bool = True, target_res: int = 1080, res_mode: str = "Width",
-                  rotation: float = 0, flip_h: bool = False, flip_v: bool = False):
+                  rotation: float = 0, flip_h: bool = False, flip_v: bool = False,
+                  encoder: str = "Original", preset: str = "Max Quality", target_kb: int = 0,
+                  variants: list = None, stats: dict = None, decoded=None):
     """
     Process image: Transform (Rotate/Flip), Crop, Resize, Save with Metadata.
     normalized_crop: (x, y, w, h) as float 0.0-1.0 relative to image size.
+    encoder/preset: see ENCODERS and ENCODER_PRESETS.
+    target_kb: if > 0, lower the quality of lossy encoders until the file fits.
+    variants: optional list of dicts overriding the output settings above plus
+        'suffix'/'subfolder' (see resolve_variants). The source is decoded and
+        transformed once; every variant is produced from the shared crop.
+    stats: optional dict that receives total 'bytes' and 'encode_s', a per-output
+        list under 'variants' ('out_path', 'bytes', 'encode_s', 'quality') and
+        seconds per pipeline stage under 'timings' (see STAGES).
+    decoded: optional already decoded, upright (EXIF orientation applied) PIL
+        image of source_path, e.g. from the viewer cache. It replaces the disk
+        decode only when it matches what that decode would produce (see
+        _bridge_matches; no reduced JPEG decode); metadata is still read from the file.
     """
+    outputs = resolve_variants(output_path, {
+        'downsample': downsample, 'target_res': target_res, 'res_mode': res_mode,
+        'encoder': encoder, 'preset': preset, 'target_kb': target_kb, 'variants': variants,
+    })
+    timings = {}
+    if stats is not None:
+        stats['timings'] = timings
     try:
+        start = time.perf_counter()
         # Load Image
         image = Image.open(source_path)
         
         # Handle EXIF orientation and metadata preservation
         exif_obj = image.getexif()
         icc_profile = image.info.get('icc_profile')
+        orientation = exif_obj.get(0x0112, 1) if exif_obj else 1
+        
+        # JPEG only: let the decoder skip detail the final resize would throw away.
+        # The decode has to cover the largest output, so any full-size variant disables it.
+        drafted = False
+        if all(out['downsample'] for out in outputs):
+            targets = [(out['target_res'], out['res_mode']) for out in outputs]
+            drafted = _draft_for_target(image, normalized_crop, targets, rotation, orientation)
+        
+        # Pixels decoded elsewhere are already upright
+        if decoded is not None and (drafted or not _bridge_matches(source_path, image, orientation, decoded)):
+            decoded = None
+        source_orientation = 1 if decoded is not None else orientation
+        source_size = decoded.size if decoded is not None else image.size
         
-        # Transpose based on EXIF tag (rotates pixels to upright)
-        image = ImageOps.exif_transpose(image)
+        transform = _crop_transform(source_size, source_orientation, normalized_crop,
+                                    rotation, flip_h, flip_v)
+        if transform is None:
+            print(f"Invalid crop dimensions for {source_path}")
+            return False
+        crop_size, matrix = transform
+        
+        band = None
+        if decoded is None:
+            band = _strip_band(image, _source_box(crop_size, matrix, image.size))
+        start = _mark(timings, 'open', start)
+        
+        # Decode explicitly so its cost isn't hidden inside the transform.
+        # Uncompressed strip TIFFs only read the rows the crop touches.
+        source = image
+        if decoded is not None:
+            source = decoded
+        elif band:
+            source = _load_strips(image, *band)
+            matrix = _compose((1, 0, 0, 0, 1, -band[0]), matrix)
+        else:
+            image.load()
+        start = _mark(timings, 'decode', start)
         
         # Strip orientation tag from EXIF object so it's not saved back.
         # Orientation is tag 274 (0x0112).
         if exif_obj and 0x0112 in exif_obj:
             del exif_obj[0x0112]
         
-        # Apply Custom Transformations
-        if flip_h:
-            image = image.transpose(Image.FLIP_LEFT_RIGHT)
-        if flip_v:
-            image = image.transpose(Image.FLIP_TOP_BOTTOM)
-            
-        if rotation != 0:
-            # Qt is clockwise, PIL is counter-clockwise
-            image = image.rotate(-rotation, expand=True)
-
-        # Calculate crop pixels
-        orig_w, orig_h = image.size
-        nx, ny, nw, nh = normalized_crop
-        
-        left = int(nx * orig_w)
-        top = int(ny * orig_h)
-        right = int((nx + nw) * orig_w)
-        bottom = int((ny + nh) * orig_h)
+        # Orientation, flips, rotation and crop in one resampling pass
+        crop_img = _render_crop(source, crop_size, matrix, rotation)
+        # Release the decoded source before resizing/encoding to lower peak memory
+        if source is not decoded:
+            source.close()
+        image.close()
+        start = _mark(timings, 'transform', start)
         
-        # Clamp
-        left = max(0, left)
-        top = max(0, top)
-        right = min(orig_w, right)
-        bottom = min(orig_h, bottom)
-        
-        # Crop
-        final_img = image.crop((left, top, right, bottom))
-        
-        # Final Dimensions calculation
-        crop_w = right - left
-        crop_h = bottom - top
+        metadata = {}
+        if icc_profile:
+            metadata['icc_profile'] = icc_profile
+        if exif_obj:
+            metadata['exif'] = exif_obj.tobytes()
         
-        if crop_w <= 0 or crop_h <= 0:
-            print(f"Invalid crop dimensions for {source_path}")
-            return False
+        variant_stats = []
+        for out in outputs:
+            final_img = crop_img
+            if out['downsample']:
+                final_img = crop_img.resize(_target_size(crop_img.size, out['target_res'], out['res_mode']),
+                                            Image.Resampling.LANCZOS)
+            start = _mark(timings, 'resize', start)
             
-        if downsample:
-            if res_mode == "Width":
-                tw = int(target_res)
-                th = int(tw * (crop_h / crop_w))
-            else: # Height
-                th = int(target_res)
-                tw = int(th * (crop_w / crop_h))
+            # Save
+            out_dir = os.path.dirname(out['out_path'])
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
             
-            final_img = final_img.resize((tw, th), Image.Resampling.LANCZOS)
-        
-        # Save
-        out_dir = os.path.dirname(output_path)
-        if out_dir:
-            os.makedirs(out_dir, exist_ok=True)
-        
-        save_kwargs = {'quality': 100}
-        if icc_profile:
-            save_kwargs['icc_profile'] = icc_profile
-        if exif_obj:
-            save_kwargs['exif'] = exif_obj.tobytes()
+            encode_start = start
+            data, quality = encode_image(final_img, out['out_path'], out['encoder'], out['preset'],
+                                         out['target_kb'], metadata)
+            start = _mark(timings, 'encode', start)
+            encode_s = start - encode_start
             
-        final_img.save(output_path, **save_kwargs)
+            with open(out['out_path'], 'wb') as f:
+                f.write(data)
+            start = _mark(timings, 'write', start)
+            
+            variant_stats.append({
+                'out_path': out['out_path'],
+                'bytes': len(data),
+                'encode_s': encode_s,
+                'quality': quality,
+            })
+        
+        if stats is not None:
+            stats['bytes'] = sum(v['bytes'] for v in variant_stats)
+            stats['encode_s'] = sum(v['encode_s'] for v in variant_stats)
+            stats['variants'] = variant_stats
         return True
             
     except Exception as e:
@@ -90,6 +183,459 @@ def process_image(source_path: str, normalized_crop: tuple, output_path: str,
         return False
 
 
+def _mark(timings, stage, start):
+    """Adds the time since start to timings[stage] and returns the current time."""
+    now = time.perf_counter()
+    timings[stage] = timings.get(stage, 0.0) + (now - start)
+    return now
+
+
+def _target_size(crop_size, target_res, res_mode):
+    crop_w, crop_h = crop_size
+    if res_mode == "Width":
+        tw = int(target_res)
+        th = int(tw * (crop_h / crop_w))
+    else: # Height
+        th = int(target_res)
+        tw = int(th * (crop_w / crop_h))
+    return max(1, tw), max(1, th)
+
+
+# Output settings a variant may override
+VARIANT_SETTINGS = ('downsample', 'target_res', 'res_mode', 'encoder', 'preset', 'target_kb')
+
+
+def resolve_variants(output_path, options):
+    """
+    Expand export options into one settings dict per output file.
+    options: process_image keyword arguments; an optional 'variants' list holds
+    dicts overriding VARIANT_SETTINGS plus 'suffix' (appended to the file stem)
+    and 'subfolder' (relative to the output folder). Each result has 'out_path'.
+    """
+    base = {
+        'downsample': options.get('downsample', True),
+        'target_res': options.get('target_res', 1080),
+        'res_mode': options.get('res_mode', "Width"),
+        'encoder': options.get('encoder', "Original"),
+        'preset': options.get('preset', "Max Quality"),
+        'target_kb': options.get('target_kb', 0),
+    }
+    variants = options.get('variants')
+    if not variants:
+        return [dict(base, out_path=output_path)]
+
+    outputs = []
+    directory, filename = os.path.split(output_path)
+    stem, ext = os.path.splitext(filename)
+    for variant in variants:
+        out = dict(base)
+        out.update({k: variant[k] for k in VARIANT_SETTINGS if k in variant})
+        out_dir = directory
+        if variant.get('subfolder'):
+            out_dir = os.path.join(directory, variant['subfolder'])
+        out_name = output_filename(stem + variant.get('suffix', '') + ext, out['encoder'])
+        out['out_path'] = os.path.join(out_dir, out_name)
+        outputs.append(out)
+    return outputs
+
+
+def parse_variant_sizes(text):
+    """
+    Parse extra output sizes like "2160, 320h" into variant dicts.
+    A trailing 'w'/'h' picks the side (width by default); each size gets its
+    own subfolder (e.g. "2160w"). Raises ValueError on malformed input.
+    """
+    variants = []
+    for part in str(text).replace(";", ",").split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        res_mode = "Width"
+        if part[-1] in ("w", "h"):
+            res_mode = "Height" if part[-1] == "h" else "Width"
+            part = part[:-1].strip()
+        res = int(part)
+        if res <= 0:
+            raise ValueError(f"Invalid size: {res}")
+        variants.append({
+            'downsample': True,
+            'target_res': res,
+            'res_mode': res_mode,
+            'subfolder': f"{res}{res_mode[0].lower()}",
+        })
+    return variants
+
+
+def output_filename(filename, encoder):
+    """Returns filename with its extension changed to match the encoder's format."""
+    fmt = _ENCODER_FORMATS.get(encoder)
+    if not fmt:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    if ext.lower() in _FORMAT_EXTENSIONS[fmt]:
+        return filename
+    return stem + _FORMAT_EXTENSIONS[fmt][0]
+
+
+def encode_image(image, output_path, encoder="Original", preset="Max Quality",
+                 target_kb=0, metadata=None):
+    """
+    Encode image in memory. Returns (bytes, quality used or None).
+    With target_kb > 0, lossy formats binary-search the highest quality that fits.
+    """
+    metadata = metadata or {}
+    fmt = _ENCODER_FORMATS.get(encoder)
+    if not fmt:
+        ext = os.path.splitext(output_path)[1].lower()
+        fmt = Image.registered_extensions().get(ext, "JPEG")
+
+    quality, webp_method, png_level = ENCODER_PRESETS.get(preset, ENCODER_PRESETS["Max Quality"])
+    image = _prepare_mode(image, fmt)
+
+    kwargs = dict(metadata)
+    if fmt == "WEBP":
+        kwargs['method'] = webp_method
+    elif fmt == "PNG":
+        kwargs['compress_level'] = png_level
+    elif encoder == "JPEG Progressive":
+        kwargs['progressive'] = True
+    elif encoder == "JPEG Optimized":
+        kwargs['optimize'] = True
+
+    def encode(q):
+        buf = io.BytesIO()
+        if q is None:
+            image.save(buf, format=fmt, **kwargs)
+        else:
+            image.save(buf, format=fmt, quality=q, **kwargs)
+        return buf.getvalue()
+
+    # PNG is lossless: quality has no meaning and the size can't be targeted
+    if fmt == "PNG":
+        return encode(None), None
+
+    data = encode(quality)
+    budget = int(target_kb) * 1024
+    if budget <= 0 or len(data) <= budget or fmt not in ("JPEG", "WEBP"):
+        return data, quality
+
+    best = None
+    low, high = MIN_TARGET_QUALITY, quality - 1
+    while low <= high:
+        mid = (low + high) // 2
+        candidate = encode(mid)
+        if len(candidate) <= budget:
+            best = (candidate, mid)
+            low = mid + 1
+        else:
+            high = mid - 1
+
+    if best is None:
+        # Can't fit: deliver the smallest file we are willing to make
+        return encode(MIN_TARGET_QUALITY), MIN_TARGET_QUALITY
+    return best
+
+
+def _prepare_mode(image, fmt):
+    """Convert to a pixel mode the target format can store."""
+    if image.mode in ("I;16", "I;16B", "I;16L", "I"):
+        # Scale 16-bit samples down instead of clipping them
+        if fmt in ("JPEG", "WEBP"):
+            image = image.convert("I").point(lambda v: v * (1 / 256)).convert("L")
+    if fmt == "JPEG" and image.mode not in ("L", "RGB", "CMYK"):
+        image = image.convert("RGB")
+    elif fmt == "WEBP" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.mode or image.mode == "P" else "RGB")
+    return image
+
+
+def _compose(m1, m2):
+    """Returns the affine p -> m1(m2(p)), both given as (a, b, c, d, e, f)."""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * d2, a1 * b2 + b1 * e2, a1 * c2 + b1 * f2 + c1,
+            d1 * a2 + e1 * d2, d1 * b2 + e1 * e2, d1 * c2 + e1 * f2 + f1)
+
+
+def _rotation_terms(rotation):
+    """(cos, sin) for a clockwise rotation, exact for multiples of 90 degrees."""
+    angle = rotation % 360.0
+    if angle in (0, 90, 180, 270):
+        return {0: (1, 0), 90: (0, 1), 180: (-1, 0), 270: (0, -1)}[int(angle)]
+    rad = math.radians(rotation)
+    # Same rounding as Image.rotate so expanded sizes match exactly
+    return round(math.cos(rad), 15), round(math.sin(rad), 15)
+
+
+def rotated_size(w, h, rotation):
+    """Canvas size after Image.rotate(-rotation, expand=True)."""
+    cos_a, sin_a = _rotation_terms(rotation)
+    if sin_a == 0:
+        return w, h
+    if cos_a == 0:
+        return h, w
+    xs = []
+    ys = []
+    for x, y in ((0, 0), (w, 0), (w, h), (0, h)):
+        dx, dy = x - w / 2, y - h / 2
+        xs.append(cos_a * dx + sin_a * dy + w / 2)
+        ys.append(-sin_a * dx + cos_a * dy + h / 2)
+    return (math.ceil(max(xs)) - math.floor(min(xs)),
+            math.ceil(max(ys)) - math.floor(min(ys)))
+
+
+def _crop_box(normalized_crop, width, height):
+    """Integer crop box (left, top, right, bottom) clamped to width x height."""
+    nx, ny, nw, nh = normalized_crop
+    left = max(0, int(nx * width))
+    top = max(0, int(ny * height))
+    right = min(width, int((nx + nw) * width))
+    bottom = min(height, int((ny + nh) * height))
+    return left, top, right, bottom
+
+
+def _crop_transform(size, orientation, normalized_crop, rotation, flip_h, flip_v):
+    """
+    Affine mapping each pixel of the final crop back to raw source pixels of an
+    image of `size`: crop -> rotation (expanded canvas) -> flips -> EXIF orientation.
+    Returns (crop_size, matrix), or None for an empty crop.
+    """
+    raw_w, raw_h = size
+    if orientation in (5, 6, 7, 8):
+        w, h = raw_h, raw_w
+    else:
+        w, h = raw_w, raw_h
+
+    rot_w, rot_h = rotated_size(w, h, rotation)
+    left, top, right, bottom = _crop_box(normalized_crop, rot_w, rot_h)
+    crop_w = right - left
+    crop_h = bottom - top
+    if crop_w <= 0 or crop_h <= 0:
+        return None
+
+    # Crop offset within the rotated canvas
+    matrix = (1, 0, left, 0, 1, top)
+
+    # Rotated canvas -> flipped image (inverse of a clockwise rotation about the centers)
+    cos_a, sin_a = _rotation_terms(rotation)
+    matrix = _compose((1, 0, -rot_w / 2, 0, 1, -rot_h / 2), matrix)
+    matrix = _compose((cos_a, sin_a, w / 2, -sin_a, cos_a, h / 2), matrix)
+
+    # Flips are their own inverse
+    if flip_v:
+        matrix = _compose((1, 0, 0, 0, -1, h), matrix)
+    if flip_h:
+        matrix = _compose((-1, 0, w, 0, 1, 0), matrix)
+
+    orientation_map = _ORIENTATION_MAPS.get(orientation)
+    if orientation_map:
+        matrix = _compose(orientation_map(raw_w, raw_h), matrix)
+
+    return (crop_w, crop_h), matrix
+
+
+def _render_crop(image, crop_size, matrix, rotation):
+    """
+    Resample only the cropped region of `image` with a single Image.transform,
+    so no full-frame intermediate is ever allocated.
+    """
+    # Right-angle transforms land exactly on pixel centers: copy, don't filter.
+    # Palette/bilevel images can't be interpolated (Image.resize does the same).
+    cos_a, sin_a = _rotation_terms(rotation)
+    if sin_a == 0 or cos_a == 0 or image.mode in ("1", "P"):
+        return image.transform(crop_size, Image.Transform.AFFINE, matrix, Image.Resampling.NEAREST)
+
+    # Pillow's filters garble packed 16-bit modes; interpolate them as 32-bit
+    if image.mode.startswith("I;16"):
+        mode = image.mode
+        result = image.convert("I").transform(crop_size, Image.Transform.AFFINE, matrix,
+                                              Image.Resampling.BICUBIC)
+        return result.convert(mode)
+    return image.transform(crop_size, Image.Transform.AFFINE, matrix, Image.Resampling.BICUBIC)
+
+
+def _source_box(crop_size, matrix, size, margin=3):
+    """Raw source pixels (left, top, right, bottom) the crop samples from, plus filter margin."""
+    crop_w, crop_h = crop_size
+    a, b, c, d, e, f = matrix
+    xs = []
+    ys = []
+    for x, y in ((0, 0), (crop_w, 0), (crop_w, crop_h), (0, crop_h)):
+        xs.append(a * x + b * y + c)
+        ys.append(d * x + e * y + f)
+    return (max(0, math.floor(min(xs)) - margin), max(0, math.floor(min(ys)) - margin),
+            min(size[0], math.ceil(max(xs)) + margin), min(size[1], math.ceil(max(ys)) + margin))
+
+
+def _strip_band(image, box):
+    """
+    Rows (top, bottom) to decode from an unloaded, uncompressed strip TIFF so
+    that box is covered, or None if the image has to be decoded whole
+    (compressed, tiled, planar, or nothing to skip).
+    """
+    if (image.format != "TIFF" or image.mode == "P" or not image.tile
+            or image.tag_v2.get(284, 1) != 1):
+        return None
+    for codec, (x0, _, x1, _), _, args in image.tile:
+        if codec != "raw" or (x0, x1) != (0, image.width) or tuple(args[1:3]) != (0, 1):
+            return None
+    top, bottom = box[1], box[3]
+    if bottom - top >= image.height:
+        return None
+    return top, bottom
+
+
+def _load_strips(image, top, bottom):
+    """Decode only rows top..bottom of an image accepted by _strip_band."""
+    bits = image.tag_v2.get(258, (8,))
+    bits = bits if isinstance(bits, tuple) else (bits,)
+    row_bytes = (image.width * sum(bits) + 7) // 8
+
+    band = Image.new(image.mode, (image.width, bottom - top))
+    for _, (_, y0, _, y1), offset, args in image.tile:
+        first = max(y0, top)
+        last = min(y1, bottom)
+        if first >= last:
+            continue
+        image.fp.seek(offset + (first - y0) * row_bytes)
+        data = image.fp.read((last - first) * row_bytes)
+        strip = Image.frombytes(image.mode, (image.width, last - first), data, "raw", args[0])
+        band.paste(strip, (0, first - top))
+    return band
+
+
+def _bytes_per_pixel(mode):
+    """Bytes Pillow uses per pixel in memory for mode."""
+    if mode in ("1", "L", "P"):
+        return 1
+    if mode.startswith("I;16"):
+        return 2
+    return 4
+
+
+def _draft_for_target(image, normalized_crop, targets, rotation, orientation):
+    """
+    Configure reduced-scale (DCT) decoding for JPEGs before pixels are loaded.
+    targets: list of (target_res, res_mode). Picks the smallest decode that still
+    covers the crop at the largest target, so the final Lanczos resize always
+    downsamples and output quality is unchanged. Returns True if a reduced
+    decode was configured.
+    """
+    if image.format != "JPEG":
+        return False
+
+    raw_w, raw_h = image.size
+    # Orientations 5-8 swap width and height
+    if orientation in (5, 6, 7, 8):
+        w, h = raw_h, raw_w
+    else:
+        w, h = raw_w, raw_h
+
+    # Bounding box after rotate(expand=True); scale is uniform, so crop size
+    # in these units tells how much of the source resolution is needed.
+    rad = math.radians(rotation)
+    cos_a, sin_a = abs(math.cos(rad)), abs(math.sin(rad))
+    rot_w = w * cos_a + h * sin_a
+    rot_h = w * sin_a + h * cos_a
+
+    _, _, nw, nh = normalized_crop
+    scale = 0.0
+    for target_res, res_mode in targets:
+        if res_mode == "Width":
+            crop_px = nw * rot_w
+        else:
+            crop_px = nh * rot_h
+        if crop_px <= 0:
+            return False
+        scale = max(scale, float(target_res) / crop_px)
+
+    if scale >= 1.0:
+        return False
+
+    requested = (math.ceil(raw_w * scale), math.ceil(raw_h * scale))
+    image.draft(image.mode, requested)
+    return image.size != (raw_w, raw_h)
+
+
+def estimate_peak_memory(source_path: str, normalized_crop: tuple, rotation: float = 0,
+                         flip_h: bool = False, flip_v: bool = False, options: dict = None) -> int:
+    """
+    Rough peak bytes process_image needs for this export, from the header only.
+    Counts the decoded source (after JPEG draft or strip-restricted decoding)
+    alongside the crop, then the crop alongside the largest encoded output.
+    options: process_image keyword arguments (see resolve_variants).
+    """
+    outputs = resolve_variants("", options or {})
+    with Image.open(source_path) as image:
+        orientation = image.getexif().get(0x0112, 1)
+        if all(out['downsample'] for out in outputs):
+            targets = [(out['target_res'], out['res_mode']) for out in outputs]
+            _draft_for_target(image, normalized_crop, targets, rotation, orientation)
+        transform = _crop_transform(image.size, orientation, normalized_crop, rotation, flip_h, flip_v)
+        if transform is None:
+            return 0
+        crop_size, matrix = transform
+        source_w, source_h = image.size
+        band = _strip_band(image, _source_box(crop_size, matrix, image.size))
+        if band:
+            source_h = band[1] - band[0]
+        bpp = _bytes_per_pixel(image.mode)
+
+    crop_bytes = crop_size[0] * crop_size[1] * bpp
+    output_bytes = 0
+    for out in outputs:
+        out_w, out_h = crop_size
+        if out['downsample']:
+            out_w, out_h = _target_size(crop_size, out['target_res'], out['res_mode'])
+        # Resized image plus a mode-converted copy / encode buffer
+        output_bytes = max(output_bytes, out_w * out_h * (bpp + 4))
+    return max(source_w * source_h * bpp + crop_bytes, crop_bytes + output_bytes)
+
+
+# Source formats whose opaque 8-bit RGB decodes by Qt (the viewer cache) and
+# Pillow can agree exactly; alpha is premultiplied by Qt, so never bridged
+_BRIDGE_FORMATS = ("JPEG", "PNG", "TIFF", "WEBP")
+# Format -> whether the two decoders matched, checked once per format and process
+_bridge_checked = {}
+
+
+def _bridge_matches(source_path, image, orientation, decoded):
+    """
+    Whether decoded can stand in for Pillow's decode of the opened image.
+    The first time per format it decodes the file too and compares, so a
+    decoder build that differs turns the bridge off instead of changing output.
+    """
+    if (image.format not in _BRIDGE_FORMATS or image.mode != "RGB" or decoded.mode != "RGB"
+            or decoded.size != _oriented_size(image.size, orientation)):
+        return False
+    matches = _bridge_checked.get(image.format)
+    if matches is None:
+        with Image.open(source_path) as reference:
+            upright = ImageOps.exif_transpose(reference)
+            matches = ImageChops.difference(upright, decoded).getbbox() is None
+            upright.close()
+        _bridge_checked[image.format] = matches
+        if not matches:
+            print(f"Cached {image.format} decodes differ from the file's; exporting from disk")
+    return matches
+
+
+def _oriented_size(size, orientation):
+    """Size of an image of raw `size` once its EXIF orientation is applied."""
+    w, h = size
+    if orientation in (5, 6, 7, 8):
+        return h, w
+    return w, h
+
+
+def read_oriented_size(source_path: str) -> tuple:
+    """
+    Upright (EXIF-oriented) image size read from the header only, no decode.
+    """
+    with Image.open(source_path) as image:
+        return _oriented_size(image.size, image.getexif().get(0x0112, 1))
+
+
 def calculate_default_crop(image_width: int, image_height: int, target_ratio_str: str) -> tuple:
     """
     Calculate default normalized crop rect (x, y, w, h) for a given aspect ratio.
@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from core.metrics import metrics
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_IO_THREADS = 3
+# First read of a file; its duration is reported as the access latency
+FIRST_CHUNK = 64 * 1024
+
+
+def storage_root(path):
+    """Mount point (or drive) holding path, used to group I/O statistics."""
+    path = os.path.abspath(path)
+    drive, _ = os.path.splitdrive(path)
+    if drive:
+        return drive  # Windows drive or UNC share
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class RootStats:
+    """Read counters for one storage root."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.first_chunk_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'files': self.files,
+            'mb': self.bytes / (1024 * 1024),
+            'mb_per_s': self.bytes / (1024 * 1024) / self.seconds if self.seconds else 0.0,
+            'latency_ms': self.first_chunk_seconds * 1000 / self.files if self.files else 0.0,
+        }
+
+
+class ReadAhead:
+    """
+    I/O stage ahead of decoding: reads the raw bytes of upcoming files, in
+    the order given to schedule(), on a few threads of its own into a buffer
+    of at most max_bytes. Decoders take the bytes with get() and work from
+    memory, so slow storage stalls these threads instead of decode threads.
+    skip(path), if given, is asked on an I/O thread before reading a path.
+    """
+
+    def __init__(self, max_bytes=None, io_threads=DEFAULT_IO_THREADS, skip=None):
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.io_threads = io_threads
+        self.skip = skip
+        self._executor = ThreadPoolExecutor(io_threads, thread_name_prefix="read-ahead")
+        self._cond = threading.Condition()
+        self._buffers = OrderedDict()  # path -> bytearray, oldest first
+        self._bytes = 0                # buffered plus reserved by reads in flight
+        self._order = []               # scheduled paths, nearest first
+        self._in_flight = set()
+        self._passed = set()           # not to be read until the next schedule()
+        self._waiters = {}             # path -> callbacks for when_ready
+        self._roots = {}               # directory -> storage root
+        self.root_stats = {}           # storage root -> RootStats
+        self.hits = 0
+        self.misses = 0
+
+    def schedule(self, paths):
+        """Sets the upcoming files, nearest first; replaces the previous order."""
+        with self._cond:
+            self._order = list(paths)
+            self._passed.clear()
+            # Waiters for files that dropped out of the order read them themselves
+            scheduled = set(self._order)
+            released = [self._waiters.pop(path) for path in list(self._waiters)
+                        if path not in scheduled and path not in self._in_flight]
+            self._fill()
+        for callbacks in released:
+            for callback in callbacks:
+                callback()
+
+    def when_ready(self, path, callback):
+        """
+        Calls callback() once path is buffered or won't be read ahead: right
+        away if that's already the case, else later on an I/O thread.
+        """
+        with self._cond:
+            if path in self._in_flight or (path in self._order and path not in self._buffers
+                                           and path not in self._passed):
+                self._waiters.setdefault(path, []).append(callback)
+                return
+        callback()
+
+    def get(self, path):
+        """
+        Buffered bytes of path, waiting for a read in flight; None if it
+        isn't buffered. A miss stops the stage from reading it later.
+        """
+        with self._cond:
+            while path in self._in_flight:
+                self._cond.wait()
+            data = self._buffers.get(path)
+            if data is None:
+                if path in self._order:
+                    self.misses += 1
+                    metrics.count('read_ahead.misses')
+                    self._passed.add(path)  # the decoder reads it itself
+                return None
+            self.hits += 1
+            metrics.count('read_ahead.hits')
+            self._buffers.move_to_end(path)
+            return data
+
+    def peek(self, path):
+        """Buffered bytes of path, or None; doesn't wait or change what is read."""
+        with self._cond:
+            return self._buffers.get(path)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'buffered_mb': self._bytes / (1024 * 1024),
+                'roots': {root: s.as_dict() for root, s in self.root_stats.items()},
+            }
+
+    def shutdown(self):
+        """Stops reading; reads in flight finish without calling back."""
+        with self._cond:
+            self._order = []
+            self._waiters.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fill(self):
+        """Starts reads for the nearest unbuffered paths. Caller holds the lock."""
+        for path in self._order:
+            if len(self._in_flight) >= self.io_threads:
+                break
+            if path in self._buffers or path in self._in_flight or path in self._passed:
+                continue
+            self._in_flight.add(path)
+            self._executor.submit(self._read, path)
+
+    def _reserve(self, path, size):
+        """
+        Makes room for size bytes, dropping buffers that are no longer
+        scheduled, oldest first. False if the buffer is full of nearer files.
+        """
+        scheduled = set(self._order)
+        if path not in scheduled:
+            return False
+        for other in list(self._buffers):
+            if self._bytes + size <= self.max_bytes:
+                break
+            if other not in scheduled:
+                self._bytes -= len(self._buffers.pop(other))
+        if self._bytes + size > self.max_bytes:
+            return False
+        self._bytes += size
+        return True
+
+    def _read(self, path):
+        data = None
+        reserved = 0
+        try:
+            if self.skip is not None and self.skip(path):
+                return
+            directory = os.path.dirname(path)
+            root = self._roots.get(directory)
+            if root is None:
+                root = self._roots[directory] = storage_root(directory)
+
+            start = time.perf_counter()
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                with self._cond:
+                    if not self._reserve(path, size):
+                        return
+                reserved = size
+                buffer = bytearray(size)
+                view = memoryview(buffer)
+                filled = f.readinto(view[:FIRST_CHUNK])
+                first_chunk = time.perf_counter() - start
+                while filled < size:
+                    n = f.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+            elapsed = time.perf_counter() - start
+            if filled == size:
+                data = buffer  # else truncated while reading; the decoder opens it
+        except OSError as e:
+            print(f"Read-ahead failed for {path}: {e}")
+        finally:
+            with self._cond:
+                self._in_flight.discard(path)
+                if data is not None:
+                    self._buffers[path] = data
+                    stats = self.root_stats.setdefault(root, RootStats())
+                    stats.files += 1
+                    stats.bytes += size
+                    stats.seconds += elapsed
+                    stats.first_chunk_seconds += first_chunk
+                    metrics.observe('read_ahead.read', elapsed)
+                else:
+                    self._bytes -= reserved
+                    self._passed.add(path)
+                metrics.gauge('read_ahead.bytes', self._bytes)
+                self._cond.notify_all()
+                callbacks = self._waiters.pop(path, [])
+                self._fill()
+            for callback in callbacks:
+                callback()
@@ -0,0 +1,216 @@
+import os
+import hashlib
+import math
+import queue
+import sqlite3
+import threading
+import time
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QStandardPaths
+from PySide6.QtGui import QImage
+from core.metrics import metrics
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# After an eviction pass the store is trimmed to this share of max_bytes
+EVICT_TO = 0.9
+THUMBNAIL_QUALITY = 90
+# Icon heights are rounded up to a multiple of this, so small layout changes reuse thumbnails
+SIZE_BUCKET = 20
+# The writer commits after this many changes or this long after the first one
+WRITE_BATCH = 64
+WRITE_DELAY_S = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnails_used ON thumbnails(used);
+"""
+
+
+def default_db_path():
+    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.CacheLocation)
+    return os.path.join(base or os.path.expanduser("~/.cache/QuickCrop"), "thumbnails.sqlite")
+
+
+def size_bucket(width, height):
+    """Icon size thumbnails are stored at: height rounded up to SIZE_BUCKET, same aspect."""
+    bucket_h = max(SIZE_BUCKET, math.ceil(height / SIZE_BUCKET) * SIZE_BUCKET)
+    return max(1, round(width * bucket_h / max(1, height))), bucket_h
+
+
+class ThumbnailDB:
+    """
+    Single-file SQLite store of rendered camera roll thumbnails, so reopening
+    a shoot fills the strip without decoding. Entries are keyed by source
+    path, size and mtime plus the crop, rotation, flips and icon size they
+    were rendered with, and evicted least recently used beyond max_bytes.
+    Lookups run on the caller's thread; stores and access times are written
+    in batches by a background thread on a connection of its own.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or default_db_path()
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self._stats = {}  # source path -> (size, mtime_ns) or None if unreadable, see refresh
+        self._queue = queue.Queue()
+        self._conn = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer_conn = self._connect()
+            self._conn = self._connect()  # lookups
+        except (OSError, sqlite3.Error) as e:
+            print(f"Thumbnail database unavailable: {e}")
+            return
+        self._writer = threading.Thread(target=self._write_loop, name="thumbnail-db", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def refresh(self, paths):
+        """
+        Stats the sources again; blocking, so call it off the GUI thread.
+        Returns the paths whose size or mtime changed since the last refresh.
+        """
+        changed = []
+        for path in paths:
+            try:
+                s = os.stat(path)
+                st = (s.st_size, s.st_mtime_ns)
+            except OSError:
+                st = None
+            if path in self._stats and self._stats[path] != st:
+                changed.append(path)
+            self._stats[path] = st
+        return changed
+
+    def has_stat(self, path):
+        """True once refresh has stat the path, so key needs no file access."""
+        return path in self._stats
+
+    def key(self, path, recipe, size):
+        """
+        Entry key for path rendered with recipe (crop_rect, rotation, flip_h,
+        flip_v) at icon size (w, h), from its last refresh; None if the
+        source wasn't refreshed yet or can't be read.
+        """
+        st = self._stats.get(path)
+        if st is None:
+            return None
+        crop_rect, rotation, flip_h, flip_v = recipe
+        crop = ",".join(f"{v:.5f}" for v in crop_rect) if crop_rect else "-"
+        text = (f"{os.path.abspath(path)}|{st[0]}|{st[1]}|{crop}|{float(rotation):.3f}|"
+                f"{int(bool(flip_h))}{int(bool(flip_v))}|{size[0]}x{size[1]}")
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def load(self, key):
+        """The stored thumbnail QImage for key, or None."""
+        if self._conn is None or key is None:
+            return None
+        start = time.perf_counter()
+        try:
+            row = self._conn.execute("SELECT data FROM thumbnails WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Thumbnail database read failed: {e}")
+            return None
+        image = QImage.fromData(row[0]) if row else None
+        metrics.observe('thumbnail_db.lookup', time.perf_counter() - start)
+        if image is None or image.isNull():
+            metrics.count('thumbnail_db.misses')
+            return None
+        metrics.count('thumbnail_db.hits')
+        self._queue.put(("touch", key, None))
+        return image
+
+    def store(self, key, image):
+        """Queues image under key; encoded and written on the background thread."""
+        if self._conn is not None and key is not None and not image.isNull():
+            self._queue.put(("store", key, image))
+
+    def close(self):
+        """Writes what is queued and stops the background thread."""
+        if self._conn is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        self._conn.close()
+        self._conn = None
+
+    # ── Background writer ──
+
+    def _write_loop(self):
+        try:
+            total = self._writer_conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM thumbnails").fetchone()[0]
+        except sqlite3.Error:
+            total = 0
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + WRITE_DELAY_S
+            while batch[-1] is not None and len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            total = self._write(tuple(item for item in batch if item is not None), total)
+            if stop:
+                self._writer_conn.close()
+                return
+
+    def _write(self, batch, total):
+        now = time.time()
+        touches = [(now, key) for op, key, _ in batch if op == "touch"]
+        stores = []
+        for op, key, image in batch:
+            if op == "store":
+                data = self._encode(image)
+                if data:
+                    stores.append((key, data, len(data), now))
+        try:
+            with self._writer_conn:
+                self._writer_conn.executemany("UPDATE thumbnails SET used = ? WHERE key = ?", touches)
+                for key, data, size, used in stores:
+                    old = self._writer_conn.execute("SELECT bytes FROM thumbnails WHERE key = ?", (key,)).fetchone()
+                    total -= old[0] if old else 0
+                    self._writer_conn.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)",
+                                       (key, data, size, used))
+                    total += size
+                if total > self.max_bytes:
+                    total = self._evict(total)
+        except sqlite3.Error as e:
+            print(f"Thumbnail database write failed: {e}")
+            return total
+        metrics.count('thumbnail_db.writes', len(stores))
+        return total
+
+    def _evict(self, total):
+        """Deletes least recently used entries down to EVICT_TO of max_bytes. Inside a transaction."""
+        target = self.max_bytes * EVICT_TO
+        doomed = []
+        for key, size in self._writer_conn.execute("SELECT key, bytes FROM thumbnails ORDER BY used"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._writer_conn.executemany("DELETE FROM thumbnails WHERE key = ?", doomed)
+        metrics.count('thumbnail_db.evictions', len(doomed))
+        return total
+
+    @staticmethod
+    def _encode(image):
+        buffer = QByteArray()
+        device = QBuffer(buffer)
+        device.open(QIODevice.OpenModeFlag.WriteOnly)
+        if image.hasAlphaChannel():
+            ok = image.save(device, "PNG")
+        else:
+            ok = image.save(device, "JPEG", THUMBNAIL_QUALITY)
+        device.close()
+        return bytes(buffer.data()) if ok else None
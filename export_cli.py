@@ -0,0 +1,216 @@
+"""
+Headless batch export: runs the QuickCrop export engine from a crop manifest
+without a display. Deliberately never imports PySide6 so it starts fast.
+
+    python export_cli.py crops.json -o out/ --res 1080 --sizes "2160, 320"
+
+The manifest is JSON or CSV. JSON is either a list of image rows or an object
+{"settings": {...}, "images": [...]}; settings use the same names as the
+command line options (output_dir, ratio, downsample, res, res_mode, encoder,
+preset, target_kb, sizes, workers, memory_mb) and command line options
+override them.
+
+Row fields (only "path" is required):
+    path, crop ([x, y, w, h] normalized 0-1; CSV: x, y, w, h columns),
+    rotation, flip_h, flip_v, ratio, out_name, skip
+Rows without a crop get the default centered crop for their ratio.
+
+A JSON summary, including seconds spent per pipeline stage, is printed to
+stdout (or --summary FILE); --timings FILE adds the per-image breakdown.
+Exit code is 1 if any image failed.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from core.export_engine import run_export, pick_concurrency
+from core.export_manifest import ExportManifest
+from core.export_timing import stage_totals, timing_record, write_timing_report
+from core.processor import (ENCODERS, ENCODER_PRESETS, calculate_default_crop,
+                            output_filename, parse_variant_sizes, read_oriented_size,
+                            resolve_variants, rotated_size)
+
+_TRUE_STRINGS = ("1", "true", "yes", "y", "on")
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_STRINGS
+    return bool(value)
+
+
+def load_manifest(manifest_path):
+    """Returns (settings, rows) from a JSON or CSV crop manifest."""
+    if manifest_path.lower().endswith(".csv"):
+        with open(manifest_path, "r", encoding="utf-8", newline="") as f:
+            rows = [_csv_row(row) for row in csv.DictReader(f)]
+        return {}, rows
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return {}, data
+    return data.get('settings', {}), data.get('images', [])
+
+
+def _csv_row(row):
+    row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+    crop_cols = [row.pop(k, "") for k in ('x', 'y', 'w', 'h')]
+    if all(crop_cols):
+        row['crop'] = [float(v) for v in crop_cols]
+    elif row.get('crop'):
+        row['crop'] = [float(v) for v in row['crop'].replace(",", " ").split()]
+    else:
+        row.pop('crop', None)
+    return {k: v for k, v in row.items() if v != ""}
+
+
+def build_tasks(rows, out_dir, default_ratio, encoder, base_dir=""):
+    """Turns manifest rows into export tasks. Returns (tasks, errors)."""
+    tasks = []
+    errors = []
+    for number, row in enumerate(rows, 1):
+        if _as_bool(row.get('skip', False)):
+            continue
+        path = row.get('path')
+        if not path:
+            errors.append({'path': None, 'error': f"row {number} has no path"})
+            continue
+        if base_dir and not os.path.isabs(path):
+            path = os.path.join(base_dir, path)
+
+        rotation = float(row.get('rotation', 0) or 0)
+        crop = row.get('crop')
+        if crop is None:
+            try:
+                w, h = read_oriented_size(path)
+            except Exception as e:
+                errors.append({'path': path, 'error': str(e)})
+                continue
+            # The crop is laid out on the rotated (expanded) canvas
+            w, h = rotated_size(w, h, rotation)
+            crop = calculate_default_crop(w, h, row.get('ratio') or default_ratio)
+
+        filename = row.get('out_name') or os.path.basename(path)
+        tasks.append({
+            'path': path,
+            'crop': tuple(float(v) for v in crop),
+            'out_path': os.path.join(out_dir, output_filename(filename, encoder)),
+            'rotation': rotation,
+            'flip_h': _as_bool(row.get('flip_h', False)),
+            'flip_v': _as_bool(row.get('flip_v', False)),
+        })
+    return tasks, errors
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="QuickCrop headless batch export")
+    parser.add_argument("manifest", help="crop manifest (.json or .csv)")
+    parser.add_argument("-o", "--output-dir", help="output folder")
+    parser.add_argument("--ratio", help="aspect ratio for rows without a crop (default 4:5)")
+    parser.add_argument("--no-downsample", dest="downsample", action="store_false", default=None,
+                        help="export crops at full resolution")
+    parser.add_argument("--res", type=int, help="target resolution in px (default 1080)")
+    parser.add_argument("--res-mode", choices=["Width", "Height"], help="side --res applies to")
+    parser.add_argument("--encoder", choices=ENCODERS)
+    parser.add_argument("--preset", choices=list(ENCODER_PRESETS))
+    parser.add_argument("--target-kb", type=int, help="target file size for JPEG/WebP")
+    parser.add_argument("--sizes", help='extra output sizes, e.g. "2160, 320h"')
+    parser.add_argument("--workers", type=int, help="parallel workers (default: automatic)")
+    parser.add_argument("--memory-mb", type=int,
+                        help="RAM budget for images exported in parallel (default: half of system memory)")
+    parser.add_argument("--full", action="store_true",
+                        help="re-export everything, ignoring the output folder manifest")
+    parser.add_argument("--summary", help="write the JSON summary here instead of stdout")
+    parser.add_argument("--timings", help="write per-image stage timings (JSON lines) here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    settings, rows = load_manifest(args.manifest)
+
+    def setting(name, arg_value, default):
+        if arg_value is not None:
+            return arg_value
+        return settings.get(name, default)
+
+    out_dir = setting('output_dir', args.output_dir, None)
+    if not out_dir:
+        print("error: an output folder is required (-o or settings.output_dir)", file=sys.stderr)
+        return 2
+    os.makedirs(out_dir, exist_ok=True)
+
+    encoder = setting('encoder', args.encoder, "Original")
+    options = {
+        'downsample': _as_bool(setting('downsample', args.downsample, True)),
+        'target_res': int(setting('res', args.res, 1080)),
+        'res_mode': setting('res_mode', args.res_mode, "Width"),
+        'encoder': encoder,
+        'preset': setting('preset', args.preset, "Max Quality"),
+        'target_kb': int(setting('target_kb', args.target_kb, 0)),
+    }
+    sizes = setting('sizes', args.sizes, "")
+    if sizes:
+        options['variants'] = [{}] + parse_variant_sizes(sizes)
+
+    base_dir = os.path.dirname(os.path.abspath(args.manifest))
+    tasks, errors = build_tasks(rows, out_dir, setting('ratio', args.ratio, "4:5"), encoder, base_dir)
+
+    manifest = None if args.full else ExportManifest.load(out_dir)
+    todo = [t for t in tasks if not (manifest and manifest.is_current(t, options))]
+    workers = args.workers or settings.get('workers') or pick_concurrency(todo)
+    memory_mb = int(setting('memory_mb', args.memory_mb, 0))
+
+    start = time.perf_counter()
+    exported = []
+    failed = [e['path'] for e in errors]
+    total_bytes = 0
+    records = []
+    try:
+        for _, task, success, stats in run_export(todo, options, workers=workers,
+                                                    memory_budget=memory_mb * 1024 * 1024):
+            records.append(timing_record(task, success, stats))
+            if success:
+                total_bytes += stats.get('bytes', 0)
+                exported.extend(out['out_path'] for out in resolve_variants(task['out_path'], options))
+                if manifest:
+                    manifest.record(task, options)
+            else:
+                failed.append(task['path'])
+    finally:
+        if manifest:
+            manifest.save()
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        'images': len(tasks) + len(errors),
+        'exported': len(todo) - (len(failed) - len(errors)),
+        'skipped_unchanged': len(tasks) - len(todo),
+        'failed': failed,
+        'errors': errors,
+        'outputs': exported,
+        'bytes_written': total_bytes,
+        'workers': workers,
+        'elapsed_s': round(elapsed, 3),
+        'stage_s': {k: round(v, 3) for k, v in stage_totals(records).items()},
+    }
+    if args.timings:
+        write_timing_report(args.timings, records)
+    text = json.dumps(summary, indent=2)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # Export pool workers are spawned; required for frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
+    sys.exit(main())
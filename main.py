@@ -1,6 +1,7 @@
 import sys
 import os
 import platform
+import multiprocessing
 from PySide6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 from core.paths import get_resource_path
@@ -31,4 +32,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Export pool workers are spawned; required for frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     main()
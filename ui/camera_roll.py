@@ -1,10 +1,143 @@
-from PySide6.QtWidgets import QListWidget, QListWidgetItem, QScroller, QStyledItemDelegate, QStyleOptionViewItem, QStyle
-from PySide6.QtCore import Signal, QSize, QThreadPool, Qt, QRect, QPoint, QTimer
-from PySide6.QtGui import QIcon, QPixmap, QPainter, QColor, QPen
+import math
+from collections import OrderedDict
+from PySide6.QtWidgets import QListView, QScroller, QStyledItemDelegate, QStyle
+from PySide6.QtCore import Signal, QSize, Qt, QRect, QPoint, QTimer, QIdentityProxyModel, QMimeData
+from PySide6.QtGui import QPixmap, QImage, QColor, QPen, QPainter
+from core.decode_service import PRIORITY_INFO, PRIORITY_THUMBNAIL
+from core.image_set import PATH_ROLE, HIDDEN_ROLE
+from core.metrics import metrics
+from core.thumbnail_db import size_bucket
+from ui.thumbnail_loader import ThumbnailLoader
+
+# Item data role beyond the ImageSet's: dimmed thumbnail of skipped images
+GREYSCALE_ROLE = 102
+
+# Memory for thumbnail pixmaps; rows near the viewport are kept even above it
+THUMBNAIL_POOL_BYTES = 64 * 1024 * 1024
+# Rows beyond the viewport that get thumbnails ahead of scrolling (at least)
+NEAR_ROWS = 10
+# Rows further than this many screens from the viewport drop their thumbnails
+FAR_SCREENS = 5
+
+_ROWS_MIME_TYPE = "application/x-quickcrop-rows"
+
+DEFAULT_RECIPE = (None, 0, False, False)  # (crop_rect, rotation, flip_h, flip_v)
+
+
+class ThumbnailPool:
+    """
+    Thumbnail pixmaps by path, least recently used first, within a byte
+    budget. Each remembers the key (recipe and size) it was rendered for
+    and, once asked for, its greyscale variant.
+    """
+
+    def __init__(self, max_bytes=THUMBNAIL_POOL_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> [pixmap, key, greyscale or None]
+        self.bytes_used = 0
+
+    def __contains__(self, path):
+        return path in self._entries
+
+    def paths(self):
+        return list(self._entries)
+
+    def pixmap(self, path):
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        self._entries.move_to_end(path)
+        return entry[0]
+
+    def key(self, path):
+        entry = self._entries.get(path)
+        return entry[1] if entry else None
+
+    def greyscale(self, path):
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        if entry[2] is None:
+            image = entry[0].toImage().convertToFormat(QImage.Format.Format_Grayscale8)
+            entry[2] = QPixmap.fromImage(image)
+            self.bytes_used += self._size(entry[2])
+        return entry[2]
+
+    def put(self, path, pixmap, key, keep=()):
+        """Stores pixmap for path, then evicts over budget except paths in keep."""
+        self.drop(path)
+        self._entries[path] = [pixmap, key, None]
+        self.bytes_used += self._size(pixmap)
+        for other in list(self._entries):
+            if self.bytes_used <= self.max_bytes:
+                break
+            if other != path and other not in keep:
+                self.drop(other)
+        metrics.gauge('thumbnails.pool_bytes', self.bytes_used)
+
+    def drop(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.bytes_used -= sum(self._size(p) for p in (entry[0], entry[2]) if p is not None)
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+
+    @staticmethod
+    def _size(pixmap):
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+
+class CameraRollModel(QIdentityProxyModel):
+    """The image set with thumbnails from the view's pool, and row drag & drop."""
+
+    def __init__(self, image_set, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.setSourceModel(image_set)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.pool.pixmap(index.data(PATH_ROLE))
+        if role == GREYSCALE_ROLE:
+            return self.pool.greyscale(index.data(PATH_ROLE))
+        return super().data(index, role)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled  # drops go between items
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsDragEnabled
+
+    def changed(self, path, roles=()):
+        row = self.sourceModel().row_of(path)
+        if row is not None:
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index, list(roles))
+
+    def moveRows(self, source_parent, source_row, count, dest_parent, dest_row):
+        return self.sourceModel().moveRows(self.mapToSource(source_parent), source_row, count,
+                                           self.mapToSource(dest_parent), dest_row)
+
+    # ── Drag & drop (rows move within the view; see QListView.dropEvent) ──
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def supportedDragActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [_ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        mime = QMimeData()
+        mime.setData(_ROWS_MIME_TYPE, ",".join(str(i.row()) for i in indexes).encode())
+        return mime
 
 
 class CameraRollDelegate(QStyledItemDelegate):
-    """Custom delegate: draws icon centered at iconSize within the cell, with selection indicator."""
+    """Custom delegate: draws the thumbnail centered at iconSize within the cell, with selection indicator."""
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -14,40 +147,32 @@ class CameraRollDelegate(QStyledItemDelegate):
         self._grid_mode = enabled
 
     def paint(self, painter, option, index):
-        is_hidden = index.data(101) or False
-        icon = index.data(Qt.ItemDataRole.DecorationRole)
+        is_hidden = self.parent().image_set.hidden_at(index.row())
+        pixmap = index.data(GREYSCALE_ROLE if is_hidden else Qt.ItemDataRole.DecorationRole)
 
-        if not isinstance(icon, QIcon) or icon.isNull():
+        if not isinstance(pixmap, QPixmap) or pixmap.isNull():
             return
 
         # Center the icon within the cell
         icon_size = option.decorationSize
         cell_rect = option.rect
-        
+
         target_w = icon_size.width()
         if is_hidden and not self._grid_mode:
             target_w = int(icon_size.width() * 0.15)
-        
+
         # Center the icon within the cell
         x = cell_rect.x() + (cell_rect.width() - target_w) // 2
         y = cell_rect.y() + (cell_rect.height() - icon_size.height()) // 2
         draw_rect = QRect(x, y, target_w, icon_size.height())
 
-        pixmap = icon.pixmap(icon_size)
-
+        # Thumbnails are rendered at 2x; skipped ones stretch into the narrow cell
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
         if is_hidden:
-            from PySide6.QtGui import QImage
-            # Stretch the pixmap if we are shrinking
-            if not self._grid_mode:
-                pixmap = pixmap.scaled(target_w, icon_size.height(), Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
-            
-            image = pixmap.toImage().convertToFormat(QImage.Format.Format_Grayscale8)
-            painter.save()
             painter.setOpacity(0.4)
-            painter.drawImage(draw_rect, image)
-            painter.restore()
-        else:
-            painter.drawPixmap(draw_rect, pixmap)
+        painter.drawPixmap(draw_rect, pixmap)
+        painter.restore()
 
         # Selection indicator: thick blue line below the image (normal mode only)
         if (option.state & QStyle.StateFlag.State_Selected) and not self._grid_mode:
@@ -61,55 +186,88 @@ class CameraRollDelegate(QStyledItemDelegate):
 
     def sizeHint(self, option, index):
         parent = self.parent()
-        is_hidden = index.data(101) or False
-        
-        if parent and hasattr(parent, 'grid_mode') and parent.grid_mode:
+        # Asked for every row on each layout pass; read the set directly
+        is_hidden = parent.image_set.hidden_at(index.row())
+
+        if parent.grid_mode:
             gap = parent.GRID_GAP
             icon_size = parent.iconSize()
             return QSize(icon_size.width() + gap, icon_size.height() + gap)
-        
-        # In normal mode (IconMode)
+
+        # In normal mode (horizontal strip)
         icon_size = option.decorationSize
         w = icon_size.width()
         if is_hidden:
             w = int(w * 0.15)
-        
+
         # Add a bit of gap for normal mode too
         return QSize(w + 10, icon_size.height() + 22)
 
 
-class CameraRoll(QListWidget):
+class CameraRoll(QListView):
+    """
+    Thumbnail strip (and arrange-mode grid) over an ImageSet, which it
+    follows through row signals and reorders by drag & drop. Only rows
+    in or near the viewport get thumbnails; they live in a bounded
+    ThumbnailPool and are dropped again once far off-screen.
+    """
     image_selected = Signal(str)
     hide_requested = Signal(str)
     remove_requested = Signal(str)
-    items_reordered = Signal(list)
 
     GRID_GAP = 8  # px gap between items in grid mode
 
-    def __init__(self):
+    # Sources stat by ThumbnailDB.refresh on a decode thread: paths, of which changed
+    _stats_ready = Signal(list, list)
+
+    def __init__(self, image_set, decode_service, thumbnail_db=None):
         super().__init__()
+        self.image_set = image_set
+        self.decode_service = decode_service
+        # Rendered thumbnails kept across sessions (ThumbnailDB), checked before decoding
+        self.thumbnail_db = thumbnail_db
+        # (path, max_dim) -> (image, full_size) already in memory, or (None, None)
+        self.image_source = None
+        self.active_workers = {}  # path -> (DecodeRequest, thumbnail key)
+        self.recipes = {}  # path -> (crop_rect, rotation, flip_h, flip_v) its thumbnail shows
+        self._near_rows = range(0)  # rows that currently get thumbnails
+        self._near_paths = set()    # their paths
+        self._stats_pending = set()  # paths whose ThumbnailDB.refresh is running
+        self._stats_ready.connect(self._on_stats_ready)
+        # Thumbnails follow the viewport once scrolling or layout settles
+        self._thumbnail_timer = QTimer()
+        self._thumbnail_timer.setSingleShot(True)
+        self._thumbnail_timer.setInterval(30)
+        self._thumbnail_timer.timeout.connect(self._load_visible_thumbnails)
+        self.pool = ThumbnailPool()
+        self.roll_model = CameraRollModel(image_set, self.pool, self)
+        self.setModel(self.roll_model)
+
         self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
-        self.setViewMode(QListWidget.ViewMode.IconMode)
-        self.setFlow(QListWidget.Flow.LeftToRight)
+        self.setViewMode(QListView.ViewMode.ListMode)
+        self.setFlow(QListView.Flow.LeftToRight)
         self.setWrapping(False)
-        self.setResizeMode(QListWidget.ResizeMode.Adjust)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
         self.setSpacing(0)
-        self.setMovement(QListWidget.Movement.Static)
+        self.setMovement(QListView.Movement.Static)
         self.setMouseTracking(True)
         self.setDragDropOverwriteMode(False)
         self.setDefaultDropAction(Qt.DropAction.MoveAction)
 
         # Scrolling
-        self.setHorizontalScrollMode(QListWidget.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
 
         QScroller.grabGesture(self.viewport(), QScroller.ScrollerGestureType.LeftMouseButtonGesture)
 
-        self.itemClicked.connect(self._on_item_clicked)
-        self.currentItemChanged.connect(self._on_current_item_changed)
-        # Note: PySide6 uses Signal/Slot behavior. rowsMoved is a signal on the model.
-        self.model().rowsMoved.connect(self._on_rows_moved)
+        self.clicked.connect(self._on_item_clicked)
+        self.doubleClicked.connect(self._on_item_double_clicked)
+        self.selectionModel().currentChanged.connect(self._on_current_item_changed)
+        self.roll_model.dataChanged.connect(self._on_data_changed)
+        self.roll_model.rowsAboutToBeRemoved.connect(self._on_rows_about_to_be_removed)
+        self.roll_model.modelReset.connect(self._on_model_reset)
 
         self.grid_mode = False
         self.columns = 6
@@ -122,19 +280,25 @@ class CameraRoll(QListWidget):
         self._layout_timer.setInterval(50)
         self._layout_timer.timeout.connect(self._do_update_grid_layout)
 
+        # Thumbnails follow the viewport
+        self.horizontalScrollBar().valueChanged.connect(self._schedule_thumbnails)
+        self.verticalScrollBar().valueChanged.connect(self._schedule_thumbnails)
+        self.roll_model.rowsInserted.connect(self._schedule_thumbnails)
+        self.roll_model.rowsRemoved.connect(self._schedule_thumbnails)
+
         self.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: white;
                 border: none;
             }
-            QListWidget::item {
+            QListView::item {
                 margin: 0px;
                 padding: 0px;
                 background: transparent;
                 border: none;
                 outline: none;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background: transparent;
                 border: none;
                 outline: none;
@@ -164,29 +328,22 @@ class CameraRoll(QListWidget):
         self.delegate = CameraRollDelegate(self)
         self.setItemDelegate(self.delegate)
 
-        self.thread_pool = QThreadPool()
-        self.thread_pool.setMaxThreadCount(4)
-
-        self.path_to_item = {}
-        self.active_workers = {} # (type, path) -> worker
         self.aspect_ratio = 4 / 5
         self.set_aspect_ratio("4:5")
 
     # ── Item management ─────────────────────────────────────────
 
-    def add_image(self, filename: str, path: str, crop_rect=None):
-        item = QListWidgetItem("")
-        item.setData(100, path)
-        item.setData(101, False)
-        item.setToolTip(filename)
-        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsDragEnabled | Qt.ItemFlag.ItemIsSelectable)
-        self.addItem(item)
-        self.path_to_item[path] = item
-
-        if crop_rect:
-            self.update_thumbnail(path, crop_rect)
-        else:
-            self.refresh_thumbnail(path)
+    def count(self):
+        return self.roll_model.rowCount()
+
+    def set_current_path(self, path):
+        """Selects path's row and scrolls it into view."""
+        row = self.image_set.row_of(path)
+        if row is None:
+            return
+        index = self.roll_model.index(row, 0)
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
 
     # ── Normal mode (horizontal strip) ──────────────────────────
 
@@ -202,14 +359,13 @@ class CameraRoll(QListWidget):
         base_h = 100
         base_w = int(base_h * self.aspect_ratio)
 
-        # IconMode supports variable width items via gridSize(0, 0) or by not setting it
-        # and relying on sizeHint if we use IconMode + Flow::LeftToRight + Wrapping::False
+        # Variable-width cells (skipped images are narrow), sized by the delegate
         self.setIconSize(QSize(base_w, base_h))
-        self.setGridSize(QSize()) # Disable fixed grid size to allow variable width
+        self.setGridSize(QSize())
         self.setFixedHeight(base_h + 23)
 
-        for path in self.path_to_item:
-            self.refresh_thumbnail(path)
+        # Thumbnails of the new size replace the old ones as rows come into view
+        self._schedule_thumbnails()
 
     # ── Grid mode (arrange) ─────────────────────────────────────
 
@@ -221,15 +377,16 @@ class CameraRoll(QListWidget):
             QScroller.ungrabGesture(self)
 
             # ListMode supports proper drag-and-drop reordering with reflow.
-            # gridSize is IGNORED in ListMode — item size comes from delegate sizeHint.
-            self.setViewMode(QListWidget.ViewMode.ListMode)
-            self.setFlow(QListWidget.Flow.LeftToRight)
+            # Item size comes from delegate sizeHint, the same for every cell.
+            self.setViewMode(QListView.ViewMode.ListMode)
+            self.setFlow(QListView.Flow.LeftToRight)
             self.setWrapping(True)
-            self.setMovement(QListWidget.Movement.Static)
-            self.setResizeMode(QListWidget.ResizeMode.Adjust)
+            self.setUniformItemSizes(True)
+            self.setMovement(QListView.Movement.Static)
+            self.setResizeMode(QListView.ResizeMode.Adjust)
             self.setSpacing(0)  # Gaps handled by delegate sizeHint
 
-            self.setDragDropMode(QListWidget.DragDropMode.InternalMove)
+            self.setDragDropMode(QListView.DragDropMode.InternalMove)
             self.setDragEnabled(True)
             self.setAcceptDrops(True)
             self.viewport().setAcceptDrops(True)
@@ -242,10 +399,8 @@ class CameraRoll(QListWidget):
             self.setMinimumHeight(200)
             self.setMaximumHeight(16777215)
 
-            for path, item in self.path_to_item.items():
-                is_hidden = item.data(101) or False
-                item.setHidden(is_hidden)
-                item.setFlags(item.flags() | Qt.ItemFlag.ItemIsDragEnabled | Qt.ItemFlag.ItemIsSelectable)
+            # Skipped images leave the grid
+            self._set_hidden_rows_hidden(True)
 
             self.delegate.set_grid_mode(True)
             self._update_grid_layout()
@@ -253,20 +408,25 @@ class CameraRoll(QListWidget):
             QScroller.grabGesture(self.viewport(), QScroller.ScrollerGestureType.LeftMouseButtonGesture)
 
             self.delegate.set_grid_mode(False)
-            self.setViewMode(QListWidget.ViewMode.IconMode)
-            self.setFlow(QListWidget.Flow.LeftToRight)
+            self.setViewMode(QListView.ViewMode.ListMode)
+            self.setFlow(QListView.Flow.LeftToRight)
             self.setWrapping(False)
+            self.setUniformItemSizes(False)
             self.setSpacing(0)
-            self.setDragDropMode(QListWidget.DragDropMode.NoDragDrop)
-            self.setMovement(QListWidget.Movement.Static)
+            self.setDragDropMode(QListView.DragDropMode.NoDragDrop)
+            self.setMovement(QListView.Movement.Static)
 
-            for item in self.path_to_item.values():
-                item.setHidden(False)
+            self._set_hidden_rows_hidden(False)
 
             self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
             self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
             self.set_aspect_ratio(self._current_ratio_str if hasattr(self, '_current_ratio_str') else "4:5")
 
+    def _set_hidden_rows_hidden(self, hidden):
+        for row, path in enumerate(self.image_set):
+            if self.image_set.is_hidden(path):
+                self.setRowHidden(row, hidden)
+
     def set_grid_size(self, columns):
         self.columns = columns
         self._last_grid_icon_w = 0
@@ -282,7 +442,7 @@ class CameraRoll(QListWidget):
         """Actually perform the layout update."""
         if not self.grid_mode or self._updating_layout:
             return
-            
+
         self._updating_layout = True
         try:
             # Use width minus a safe margin for scrollbar if ScrollBarAlwaysOn
@@ -300,19 +460,15 @@ class CameraRoll(QListWidget):
             # Only update if change is significant to avoid tiny oscillation loops
             if abs(icon_w - self._last_grid_icon_w) < 1:
                 return
-                
+
             self._last_grid_icon_w = icon_w
             icon_h = int(icon_w / self.aspect_ratio)
 
-            # setIconSize and setGridSize trigger layout changes in QListWidget
+            # setIconSize and setGridSize trigger a relayout
             self.setIconSize(QSize(icon_w, icon_h))
             self.setGridSize(QSize(icon_w + gap, icon_h + gap))
+            self._schedule_thumbnails()
 
-            # Hidden items update
-            for item in self.path_to_item.values():
-                is_hidden = item.data(101) or False
-                item.setHidden(self.grid_mode and is_hidden)
-                
         finally:
             self._updating_layout = False
 
@@ -320,6 +476,12 @@ class CameraRoll(QListWidget):
         super().resizeEvent(event)
         if self.grid_mode:
             self._update_grid_layout()
+        self._schedule_thumbnails()
+
+    def updateGeometries(self):
+        # Called once a (batched) layout has placed the rows
+        super().updateGeometries()
+        self._schedule_thumbnails()
 
     # ── Drag & drop event overrides ─────────────────────────────
 
@@ -340,90 +502,226 @@ class CameraRoll(QListWidget):
     def startDrag(self, supportedActions):
         super().startDrag(supportedActions)
 
-    def _on_rows_moved(self, parent, start, end, destination, row):
-        new_paths = []
-        for i in range(self.count()):
-            new_paths.append(self.item(i).data(100))
-        self.items_reordered.emit(new_paths)
-
     # ── Thumbnail loading ───────────────────────────────────────
 
     def refresh_thumbnail(self, path, rotation=0, flip_h=False, flip_v=False):
-        if path in self.path_to_item:
-            from ui.thumbnail_loader import ThumbnailLoader
-            loader = ThumbnailLoader(
-                path, 
-                size=(self.iconSize().width(), self.iconSize().height()),
-                rotation=rotation,
-                flip_h=flip_h,
-                flip_v=flip_v
-            )
-            loader.signals.finished.connect(self._on_thumbnail_loaded)
-            
-            # Keep reference to prevent GC in PySide6
-            self.active_workers[('thumb', path)] = loader
-            self.thread_pool.start(loader)
+        self.update_thumbnail(path, None, rotation, flip_h, flip_v)
 
     def update_thumbnail(self, path, crop_rect, rotation=0, flip_h=False, flip_v=False):
-        if path in self.path_to_item:
-            from ui.thumbnail_loader import ThumbnailLoader
-            loader = ThumbnailLoader(
-                path, 
-                size=(self.iconSize().width(), self.iconSize().height()), 
-                crop_rect=crop_rect,
-                rotation=rotation,
-                flip_h=flip_h,
-                flip_v=flip_v
-            )
-            loader.signals.finished.connect(self._on_thumbnail_loaded)
-            
-            # Keep reference to prevent GC in PySide6
-            self.active_workers[('thumb', path)] = loader
-            self.thread_pool.start(loader)
-
-    def _on_thumbnail_loaded(self, path, image):
-        # Cleanup worker reference
-        if ('thumb', path) in self.active_workers:
-            del self.active_workers[('thumb', path)]
-            
-        if path in self.path_to_item:
-            item = self.path_to_item[path]
-            item.setIcon(QIcon(QPixmap.fromImage(image)))
+        """Sets how path's thumbnail looks; it is rendered now if the row is near the viewport."""
+        row = self.image_set.row_of(path)
+        if row is None:
+            return
+        self.recipes[path] = (tuple(crop_rect) if crop_rect else None, rotation, flip_h, flip_v)
+        if row in self._near_rows:
+            self._request_thumbnail(row, PRIORITY_THUMBNAIL)
+
+    def reset_crops(self, keep=None):
+        """
+        Drops the crop from every thumbnail but keep's, keeping rotation and
+        flips. Uncropped thumbnails fill the icon centred, which is the
+        default crop for the roll's aspect ratio.
+        """
+        for path, (crop_rect, rotation, flip_h, flip_v) in self.recipes.items():
+            if path != keep and crop_rect is not None:
+                self.recipes[path] = (None, rotation, flip_h, flip_v)
+        self._schedule_thumbnails()
+
+    def thumbnail_pixmap(self, path):
+        """The thumbnail currently shown for path, or None if it isn't loaded."""
+        return self.pool.pixmap(path)
+
+    def _recipe(self, path):
+        return self.recipes.get(path, DEFAULT_RECIPE)
+
+    def _thumbnail_key(self, path):
+        # Rendered at a bucketed size, so small layout changes keep their thumbnails
+        size = self.iconSize()
+        return self._recipe(path) + (size_bucket(size.width(), size.height()),)
+
+    def _request_thumbnail(self, row, priority):
+        path = self.image_set.path_at(row)
+        key = self._thumbnail_key(path)
+        active = self.active_workers.get(path)
+        if active is not None and active[1] == key:
+            return
+        # A newer thumbnail supersedes one still waiting to decode
+        if active is not None:
+            del self.active_workers[path]
+            if self.decode_service.cancel(active[0]):
+                metrics.count('thumbnails.superseded')
+        if self.pool.key(path) == key:
+            return
+        if self.thumbnail_db is not None:
+            if not self.thumbnail_db.has_stat(path):
+                # Looked up once the stat arrives (_on_stats_ready)
+                self._refresh_stats([path])
+                return
+            image = self.thumbnail_db.load(self.thumbnail_db.key(path, key[:-1], key[-1]))
+            if image is not None:
+                keep = set(self.image_set.paths(self._near_rows.start, self._near_rows.stop))
+                self.pool.put(path, QPixmap.fromImage(image), key, keep)
+                self.roll_model.changed(path, [Qt.ItemDataRole.DecorationRole])
+                return
+
+        crop_rect, rotation, flip_h, flip_v = key[:-1]
+        loader = ThumbnailLoader(path, size=key[-1], crop_rect=crop_rect, rotation=rotation,
+                                 flip_h=flip_h, flip_v=flip_v)
+        metrics.count('thumbnails.requested')
+        # Rendered from a cached image when one is big enough, else decoded
+        source = None
+        if self.image_source is not None:
+            image, full_size = self.image_source(path, loader.decode_size)
+            if image is not None:
+                source = (image, full_size)
+        request = loader.request(self.decode_service, self._on_thumbnail_loaded, priority, source)
+        self.active_workers[path] = (request, key)
+
+    def _schedule_thumbnails(self, *args):
+        self._thumbnail_timer.start()
+
+    def _visible_rows(self):
+        """(first, last) rows in the viewport; rows are laid out in order."""
+        rect = self.viewport().rect()
+        if self.grid_mode:
+            first = self.indexAt(QPoint(1, 1))
+            last = self.indexAt(QPoint(rect.width() - 2, rect.height() - 2))
+        else:
+            y = rect.height() // 2
+            first = self.indexAt(QPoint(1, y))
+            last = self.indexAt(QPoint(rect.width() - 2, y))
+        first_row = first.row() if first.isValid() else 0
+        # Invalid when the rows end inside the viewport; no cell is narrower
+        # than a skipped image's, which bounds how many rows a screen holds
+        icon = self.iconSize()
+        if self.grid_mode:
+            per_screen = math.ceil(rect.width() / (icon.width() + self.GRID_GAP)) * \
+                math.ceil(rect.height() / (icon.height() + self.GRID_GAP) + 1)
+        else:
+            per_screen = math.ceil(rect.width() / (int(icon.width() * 0.15) + 10))
+        last_row = last.row() if last.isValid() else self.roll_model.rowCount() - 1
+        return first_row, max(first_row, min(last_row, first_row + per_screen))
+
+    def _load_visible_thumbnails(self):
+        """Requests thumbnails in and near the viewport and gives back those far from it."""
+        count = self.roll_model.rowCount()
+        if count == 0:
+            self._near_rows = range(0)
+            self._near_paths = set()
+            return
+        first, last = self._visible_rows()
+        screen = last - first + 1
+        margin = max(NEAR_ROWS, screen)
+        self._near_rows = range(max(0, first - margin), min(count, last + margin + 1))
+
+        # Queued thumbnails that scrolled out of reach aren't needed any more
+        for path, (request, _) in list(self.active_workers.items()):
+            if self.image_set.row_of(path) not in self._near_rows and self.decode_service.cancel(request):
+                del self.active_workers[path]
+
+        # Visible rows first, then outwards
+        center = (first + last) / 2
+        near_paths = self.image_set.paths(self._near_rows.start, self._near_rows.stop)
+        # Rows coming into reach stat their source again, so a file edited
+        # since it was last shown doesn't match its old stored thumbnail
+        if self.thumbnail_db is not None:
+            self._refresh_stats([path for path in near_paths if path not in self._near_paths])
+        self._near_paths = set(near_paths)
+        for row in sorted(self._near_rows, key=lambda r: abs(r - center)):
+            if self.grid_mode and self.image_set.is_hidden(near_paths[row - self._near_rows.start]):
+                continue
+            self._request_thumbnail(row, PRIORITY_THUMBNAIL if first <= row <= last else PRIORITY_THUMBNAIL - 1)
+
+        far = margin + FAR_SCREENS * screen
+        for path in self.pool.paths():
+            row = self.image_set.row_of(path)
+            if row is None or row < first - far or row > last + far:
+                self.pool.drop(path)
+        metrics.gauge('thumbnails.pool_bytes', self.pool.bytes_used)
+
+    def _refresh_stats(self, paths):
+        """Stats paths for the thumbnail database on a decode thread, not here."""
+        paths = [path for path in paths if path not in self._stats_pending]
+        if not paths:
+            return
+        self._stats_pending.update(paths)
+        db = self.thumbnail_db
+        self.decode_service.thread_pool.start(lambda: self._stats_ready.emit(paths, db.refresh(paths)),
+                                              PRIORITY_INFO)
+
+    def _on_stats_ready(self, paths, changed):
+        self._stats_pending.difference_update(paths)
+        # Edited on disk: the thumbnail shown is stale
+        for path in changed:
+            self.pool.drop(path)
+            self.roll_model.changed(path, [Qt.ItemDataRole.DecorationRole])
+        for path in paths:
+            row = self.image_set.row_of(path)
+            if row is not None and row in self._near_rows:
+                self._request_thumbnail(row, PRIORITY_THUMBNAIL)
+
+    def _on_thumbnail_loaded(self, request, image, is_final):
+        path = request.path
+        active = self.active_workers.get(path)
+        # Results of superseded requests are stale
+        if active is None or active[0] is not request:
+            return
+        if is_final:
+            del self.active_workers[path]
+        if image is None:
+            print(f"Thumbnail error: {request.error}")
+            return
+        metrics.count('thumbnails.delivered' if is_final else 'thumbnails.placeholders')
+        if is_final and self.thumbnail_db is not None:
+            recipe, size = active[1][:-1], active[1][-1]
+            self.thumbnail_db.store(self.thumbnail_db.key(path, recipe, size), image)
+
+        # An EXIF placeholder goes in without a key, so it still gets replaced
+        keep = set(self.image_set.paths(self._near_rows.start, self._near_rows.stop))
+        self.pool.put(path, QPixmap.fromImage(image), active[1] if is_final else None, keep)
+        self.roll_model.changed(path, [Qt.ItemDataRole.DecorationRole])
 
     # ── Selection / visibility ──────────────────────────────────
 
-    def _on_item_clicked(self, item):
-        if item:
-            path = item.data(100)
-            self.image_selected.emit(path)
+    def _on_item_clicked(self, index):
+        if index.isValid():
+            self.image_selected.emit(index.data(PATH_ROLE))
+
+    def _on_item_double_clicked(self, index):
+        if index.isValid():
+            self.hide_requested.emit(index.data(PATH_ROLE))
 
     def _on_current_item_changed(self, current, previous):
         self.viewport().update()
-        if current:
-            path = current.data(100)
-            self.image_selected.emit(path)
-
-    def set_hidden(self, path, hidden: bool):
-        if path in self.path_to_item:
-            item = self.path_to_item[path]
-            item.setData(101, hidden)
-            
-            # Use item.setHidden for Arrange Mode (makes them invisible/skipped in layout)
-            # In Normal Mode, items stay visible but shrink via delegate
-            item.setHidden(self.grid_mode and hidden)
-            
-            # Force re-layout
-            self.doItemsLayout()
-            self.viewport().update()
-
-    def remove_path(self, path):
-        if path in self.path_to_item:
-            item = self.path_to_item[path]
-            row = self.row(item)
-            self.takeItem(row)
-            del self.path_to_item[path]
+        if current.isValid():
+            self.image_selected.emit(current.data(PATH_ROLE))
 
-    def clear(self):
-        self.thread_pool.clear()
-        self.path_to_item.clear()
-        super().clear()
+    def _on_data_changed(self, top_left, bottom_right, roles=()):
+        if HIDDEN_ROLE not in roles:
+            return
+        # Arrange mode drops skipped images from the layout;
+        # in normal mode they stay and shrink via the delegate
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            self.setRowHidden(row, self.grid_mode and bool(self.roll_model.index(row, 0).data(HIDDEN_ROLE)))
+
+        # Force re-layout
+        self.doItemsLayout()
+        self.viewport().update()
+
+    def _on_rows_about_to_be_removed(self, parent, first, last):
+        for path in self.image_set.paths(first, last + 1):
+            active = self.active_workers.pop(path, None)
+            if active is not None:
+                self.decode_service.cancel(active[0])
+            self.pool.drop(path)
+            self.recipes.pop(path, None)
+
+    def _on_model_reset(self):
+        for request, _ in self.active_workers.values():
+            self.decode_service.cancel(request)
+        self.active_workers.clear()
+        self.recipes.clear()
+        self.pool.clear()
+        self._near_rows = range(0)
+        self._near_paths = set()
+        self._stats_pending.clear()
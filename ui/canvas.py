@@ -34,6 +34,9 @@ class Canvas(QGraphicsView):
         
         self.aspect_ratio = 0.8  # 4:5 default
         self.pixmap_item = None
+        self.placeholder = None      # Thumbnail drawn while no pixmap is loaded
+        self._pending_pixmap = None  # Upgrade held back until a drag ends
+        self.hud_lines = []          # Load statistics drawn over the view (F3)
         
         self.norm_crop_rect = (0, 0, 1, 1) # (nx, ny, nw, nh)
         self.crop_rect = QRectF()
@@ -99,6 +102,8 @@ class Canvas(QGraphicsView):
     # ---- Loading ----
     def load_image(self, pixmap):
         self.scene.clear()
+        self.placeholder = None
+        self._pending_pixmap = None
         self.pixmap_item = QGraphicsPixmapItem(pixmap)
         self.scene.addItem(self.pixmap_item)
         self.rotation_angle = 0.0
@@ -127,9 +132,53 @@ class Canvas(QGraphicsView):
         self.crop_changed.emit()
         self.viewport().update()
 
+    def replace_pixmap(self, pixmap):
+        """
+        Swaps in another resolution of the image on display, keeping rotation,
+        flips, crop and view. Applied after the drag if one is in progress.
+        """
+        if not self.pixmap_item:
+            self.load_image(pixmap)
+            return
+        if self.interaction_mode != "NONE":
+            self._pending_pixmap = pixmap
+            return
+        self._pending_pixmap = None
+
+        rotation, flip_h, flip_v = self.get_transform_state()
+        norm_crop = self.norm_crop_rect
+        self.pixmap_item.setPixmap(pixmap)
+        self.pixmap_item.setPos(0, 0)
+        self.pixmap_item.setRotation(0.0)
+        self.pixmap_item.setTransform(QTransform())
+        self.pixmap_item.setTransformOriginPoint(self.pixmap_item.boundingRect().center())
+
+        # Crop and view are kept in normalized terms, so they carry over as is
+        old_blocked = self.blockSignals(True)
+        try:
+            self.set_transform_state(rotation, flip_h, flip_v)
+            self.norm_crop_rect = norm_crop
+            self.update_fitting()
+        finally:
+            self.blockSignals(old_blocked)
+        self.viewport().update()
+
+    def show_placeholder(self, pixmap):
+        """Shows a thumbnail, fitted like the crop preview, until load_image is called."""
+        self.clear()
+        self.placeholder = pixmap
+        self.viewport().update()
+
+    def set_hud(self, lines):
+        """Text drawn in the top-left corner over everything; empty hides it."""
+        self.hud_lines = list(lines)
+        self.viewport().update()
+
     def clear(self):
         self.scene.clear()
         self.pixmap_item = None
+        self.placeholder = None
+        self._pending_pixmap = None
         self.preview_mode = False
         self.interaction_mode = "NONE"
         self.active_handle = None
@@ -304,12 +353,42 @@ class Canvas(QGraphicsView):
     # ---- Drawing ----
     def paintEvent(self, event):
         super().paintEvent(event)
+        if self.hud_lines:
+            self._draw_hud()
+
+    def _draw_hud(self):
+        from PySide6.QtGui import QFont, QFontMetrics
+        painter = QPainter(self.viewport())
+        font = QFont("Menlo, Consolas, monospace")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setPointSize(10)
+        painter.setFont(font)
+        fm = QFontMetrics(font)
+        pad = 8
+        width = max(fm.horizontalAdvance(line) for line in self.hud_lines) + 2 * pad
+        height = fm.lineSpacing() * len(self.hud_lines) + 2 * pad
+        painter.fillRect(QRectF(10, 10, width, height), QColor(0, 0, 0, 180))
+        painter.setPen(Qt.GlobalColor.white)
+        y = 10 + pad + fm.ascent()
+        for line in self.hud_lines:
+            painter.drawText(10 + pad, y, line)
+            y += fm.lineSpacing()
+        painter.end()
 
     def drawForeground(self, painter, rect):
         vp = QRectF(self.viewport().rect())
         painter.save()
         painter.resetTransform()
         
+        if self.pixmap_item is None and self.placeholder is not None:
+            size = self.placeholder.size().scaled(
+                int(vp.width() * 0.95), int(vp.height() * 0.95), Qt.AspectRatioMode.KeepAspectRatio)
+            target = QRectF(0, 0, size.width(), size.height())
+            target.moveCenter(vp.center())
+            painter.drawPixmap(target, self.placeholder, QRectF(self.placeholder.rect()))
+            painter.restore()
+            return
+        
         if self.preview_mode:
             if not self.scene_crop_rect_for_preview.isValid():
                 painter.restore()
@@ -860,6 +939,8 @@ class Canvas(QGraphicsView):
             self.sync_crop_from_viewport()
             self._update_handles()
             self.crop_changed.emit()
+        if self._pending_pixmap is not None:
+            self.replace_pixmap(self._pending_pixmap)
         self.setCursor(Qt.CursorShape.ArrowCursor)
         super().mouseReleaseEvent(event)
 
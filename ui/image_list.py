@@ -1,21 +1,44 @@
-from PySide6.QtWidgets import QListWidget, QListWidgetItem
-from PySide6.QtCore import Signal
+from PySide6.QtWidgets import QListView
+from PySide6.QtCore import Signal, Qt, QIdentityProxyModel
+from PySide6.QtGui import QColor
+from core.image_set import PATH_ROLE, HIDDEN_ROLE
 
-class ImageList(QListWidget):
+
+class ImageListModel(QIdentityProxyModel):
+    """The image set as file names; skipped images are struck out and greyed."""
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role in (Qt.ItemDataRole.FontRole, Qt.ItemDataRole.ForegroundRole) and index.data(HIDDEN_ROLE):
+            if role == Qt.ItemDataRole.ForegroundRole:
+                return QColor(Qt.GlobalColor.gray)
+            font = self.parent().font()
+            font.setStrikeOut(True)
+            return font
+        return super().data(index, role)
+
+
+class ImageList(QListView):
     image_selected = Signal(str)
 
-    def __init__(self):
+    def __init__(self, image_set):
         super().__init__()
-        from PySide6.QtCore import Qt
+        self.image_set = image_set
         self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
         self.setFixedWidth(200)
-        self.itemClicked.connect(self._on_item_clicked)
+        self.setUniformItemSizes(True)
+        self.list_model = ImageListModel(self)
+        self.list_model.setSourceModel(image_set)
+        self.setModel(self.list_model)
+        self.clicked.connect(self._on_item_clicked)
 
-    def add_image(self, filename: str, path: str):
-        item = QListWidgetItem(filename)
-        item.setData(100, path)  # Store full path in user role
-        self.addItem(item)
+    def set_current_path(self, path):
+        """Selects path's row and scrolls it into view."""
+        row = self.image_set.row_of(path)
+        if row is None:
+            return
+        index = self.list_model.index(row, 0)
+        self.setCurrentIndex(index)
+        self.scrollTo(index)
 
-    def _on_item_clicked(self, item):
-        path = item.data(100)
-        self.image_selected.emit(path)
+    def _on_item_clicked(self, index):
+        self.image_selected.emit(index.data(PATH_ROLE))
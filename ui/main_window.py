@@ -4,11 +4,24 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
 from PySide6.QtCore import Qt, QSize, QTimer
 from PySide6.QtGui import QIcon, QFont
 import platform
+import time
 from core.paths import get_resource_path
 from ui.image_list import ImageList
 from ui.camera_roll import CameraRoll
 from ui.canvas import Canvas
-from core.image_cache import ImageCache
+from core.image_cache import ImageCache, PROXY_SIZE
+from core.image_set import ImageSet
+from core.edit_store import EditStore
+from core.decode_service import DecodeService, PRIORITY_INFO
+from core.disk_cache import ProxyDiskCache
+from core.read_ahead import ReadAhead
+from core.thumbnail_db import ThumbnailDB
+from core.metrics import metrics
+
+# What the canvas shows for the current image, lowest first. Within one image
+# the display only ever moves up.
+TIER_NONE, TIER_THUMBNAIL, TIER_PREVIEW, TIER_PROXY, TIER_FULL = range(5)
+TIER_NAMES = ("none", "thumbnail", "exif", "proxy", "full")
 
 class MainWindow(QMainWindow):
     CUSTOM_ASPECT_LABEL = "Custom..."
@@ -45,6 +58,20 @@ class MainWindow(QMainWindow):
         self.downsample_enabled = self.settings.value("downsample_enabled", True, type=bool)
         self.res_value = int(self.settings.value("res_value", 1080))
         self.res_mode = self.settings.value("res_mode", "Width")
+        self.encoder = self.settings.value("encoder", "Original")
+        self.encoder_preset = self.settings.value("encoder_preset", "Max Quality")
+        self.target_kb = int(self.settings.value("target_kb", 0))
+        self.extra_sizes = self.settings.value("extra_sizes", "")
+        # RAM the parallel export may plan for, in MB (0 = half of system memory)
+        self.export_memory_mb = int(self.settings.value("export_memory_mb", 0))
+        # Viewer cache size in MB (0 = automatic, see default_byte_budget)
+        self.cache_budget_mb = int(self.settings.value("cache_budget_mb", 0))
+        # On-disk proxy cache size in MB (0 disables it)
+        self.proxy_cache_mb = int(self.settings.value("proxy_cache_mb", 2048))
+        # Memory for reading upcoming files ahead of decoding, in MB (0 disables it)
+        self.read_ahead_mb = int(self.settings.value("read_ahead_mb", 256))
+        # Camera roll thumbnails kept on disk between sessions, in MB (0 disables it)
+        self.thumbnail_cache_mb = int(self.settings.value("thumbnail_cache_mb", 256))
 
         # Toolbar (Stacked Widget)
         from PySide6.QtWidgets import QStackedWidget
@@ -66,7 +93,9 @@ class MainWindow(QMainWindow):
         left_panel_layout = QVBoxLayout()
         self.editor_layout.addLayout(left_panel_layout)
         
-        self.image_list = ImageList()
+        # The loaded images in order, shared by the image list, camera roll and navigation
+        self.image_set = ImageSet(self)
+        self.image_list = ImageList(self.image_set)
         left_panel_layout.addWidget(self.image_list)
         
         # Clear Images Button
@@ -166,8 +195,22 @@ class MainWindow(QMainWindow):
         right_panel.addStretch()
 
         
+        # One decode service for dimensions, thumbnails and display, so each
+        # file is read once however many of them want it at the same time
+        disk_cache = None
+        if self.proxy_cache_mb > 0:
+            disk_cache = ProxyDiskCache(max_bytes=self.proxy_cache_mb * 1024 * 1024)
+        read_ahead = None
+        if self.read_ahead_mb > 0:
+            read_ahead = ReadAhead(max_bytes=self.read_ahead_mb * 1024 * 1024)
+        self.decode_service = DecodeService(self, disk_cache=disk_cache, proxy_size=PROXY_SIZE,
+                                            read_ahead=read_ahead)
+        
         # Bottom - Camera Roll
-        self.camera_roll = CameraRoll()
+        self.thumbnail_db = None
+        if self.thumbnail_cache_mb > 0:
+            self.thumbnail_db = ThumbnailDB(max_bytes=self.thumbnail_cache_mb * 1024 * 1024)
+        self.camera_roll = CameraRoll(self.image_set, self.decode_service, self.thumbnail_db)
         self.main_layout.addWidget(self.camera_roll)
         
         # Connect signals
@@ -175,8 +218,7 @@ class MainWindow(QMainWindow):
         self.camera_roll.image_selected.connect(self.display_image)
         self.canvas.crop_changed.connect(self._on_crop_changed)
         self.canvas.navigation_requested.connect(self.navigate)
-        self.camera_roll.itemDoubleClicked.connect(self._on_camera_roll_double_clicked)
-        self.camera_roll.items_reordered.connect(self._on_items_reordered)
+        self.camera_roll.hide_requested.connect(self._on_camera_roll_double_clicked)
         
         # Debounce timer for thumbnail updates
         self.thumb_update_timer = QTimer()
@@ -185,12 +227,11 @@ class MainWindow(QMainWindow):
         
         # State tracking
         self.current_image_path = None
-        self.all_paths = []
-        self.path_to_index = {} # path -> index
-        self.path_to_dims = {}  # path -> (w, h)
-        self.info_workers = {}  # path -> worker
-        self.image_data = {} # path -> {'crop': (nx, ny, nw, nh), 'ratio': str, 'touched': bool}
-        self.hidden_paths = set()
+        self._display_tier = TIER_NONE
+        self._display_started = 0.0
+        self._nav_record = None  # latency of the image on display, see _begin_navigation
+        # Crop, ratio, transform, touched and size of every loaded image
+        self.edit_state = EditStore()
         self._update_navigation_enabled()
         
         # Timer for marking image as touched
@@ -209,8 +250,18 @@ class MainWindow(QMainWindow):
         self._last_valid_ratio = "4:5"
 
         # Performance: Image Cache
-        self.image_cache = ImageCache(proxy_window=15)
+        self.image_cache = ImageCache(proxy_window=15, proxy_size=PROXY_SIZE,
+                                      byte_budget=self.cache_budget_mb * 1024 * 1024,
+                                      decode_service=self.decode_service)
         self.image_cache.image_ready.connect(self._on_image_cached)
+        self.image_cache.preview_ready.connect(self._on_preview_ready)
+        # Cropped thumbnails render from a cached proxy instead of decoding again
+        self.camera_roll.image_source = self.image_cache.cached_image
+
+        # Load statistics overlay (F3), refreshed while shown
+        self.hud_timer = QTimer()
+        self.hud_timer.setInterval(500)
+        self.hud_timer.timeout.connect(self._update_hud)
         
         # Global Event Filter for Arrow Keys
         from PySide6.QtWidgets import QApplication
@@ -268,6 +319,48 @@ class MainWindow(QMainWindow):
         self.res_mode_combo.currentTextChanged.connect(lambda t: self.settings.setValue("res_mode", t))
         layout.addWidget(self.res_mode_combo)
         
+        line_enc = QFrame()
+        line_enc.setFrameShape(QFrame.Shape.VLine)
+        line_enc.setFrameShadow(QFrame.Shadow.Sunken)
+        layout.addWidget(line_enc)
+        
+        # Encoder UI
+        from core.processor import ENCODERS, ENCODER_PRESETS
+        self.encoder_combo = QComboBox()
+        self.encoder_combo.addItems(ENCODERS)
+        self.encoder_combo.setCurrentText(self.encoder)
+        self.encoder_combo.setToolTip("Output format")
+        self.encoder_combo.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.encoder_combo.currentTextChanged.connect(lambda t: self.settings.setValue("encoder", t))
+        layout.addWidget(self.encoder_combo)
+        
+        self.preset_combo = QComboBox()
+        self.preset_combo.addItems(list(ENCODER_PRESETS))
+        self.preset_combo.setCurrentText(self.encoder_preset)
+        self.preset_combo.setToolTip("Encoder speed/size preset")
+        self.preset_combo.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.preset_combo.currentTextChanged.connect(lambda t: self.settings.setValue("encoder_preset", t))
+        layout.addWidget(self.preset_combo)
+        
+        self.target_kb_spin = QSpinBox()
+        self.target_kb_spin.setRange(0, 100000)
+        self.target_kb_spin.setSingleStep(50)
+        self.target_kb_spin.setSuffix(" KB")
+        self.target_kb_spin.setSpecialValueText("Any size")
+        self.target_kb_spin.setToolTip("Target file size for JPEG/WebP (lowers quality until it fits)")
+        self.target_kb_spin.setValue(self.target_kb)
+        self.target_kb_spin.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.target_kb_spin.valueChanged.connect(lambda v: self.settings.setValue("target_kb", v))
+        layout.addWidget(self.target_kb_spin)
+        
+        self.sizes_btn = QPushButton()
+        self.sizes_btn.setFixedSize(80, 30)
+        self.sizes_btn.setToolTip("Additional output sizes, each written to its own subfolder")
+        self.sizes_btn.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.sizes_btn.clicked.connect(self._edit_extra_sizes)
+        layout.addWidget(self.sizes_btn)
+        self._update_sizes_button()
+        
         line3 = QFrame()
         line3.setFrameShape(QFrame.Shape.VLine)
         line3.setFrameShadow(QFrame.Shadow.Sunken)
@@ -379,66 +472,50 @@ class MainWindow(QMainWindow):
             self.settings.setValue("output_dir", folder)
 
     def load_images_list(self, images):
-        import os
-        from ui.image_info_loader import ImageInfoLoader
-        
         # Don't reset state if we have existing images
-        if not self.all_paths:
-             self.image_data = {}
+        if not len(self.image_set):
+             self.edit_state.clear()
              self.current_image_path = None
 
-        # Determine which images are actually new
-        new_images = [img for img in images if img not in self.path_to_index]
+        # One insert for the whole batch; the views add the rows and
+        # thumbnails load as they scroll into view
+        new_images = self.image_set.extend(images)
         if not new_images:
             return
+        self.edit_state.extend(new_images, self._get_active_ratio())
 
-        # Start background info loading for and set up placeholder state
+        # Background dimension fetch; shares the header read with a queued thumbnail
         for img_path in new_images:
-            filename = os.path.basename(img_path)
-            
-            # Immediately add to list with "Loading..." or similar if desired
-            # But for now just add to internal tracking
-            self.path_to_index[img_path] = len(self.all_paths)
-            self.all_paths.append(img_path)
-            
-            # Add to UI components immediately (placeholders)
-            self.image_list.add_image(filename, img_path)
-            self.camera_roll.add_image(filename, img_path) # No crop yet
-            
-            # Start background dimension fetch
-            info_worker = ImageInfoLoader(img_path)
-            # Keep reference to prevent GC in PySide6
-            self.info_workers[img_path] = info_worker
-            info_worker.signals.finished.connect(self._on_image_info_loaded)
-            self.camera_roll.thread_pool.start(info_worker)
+            self.decode_service.request(img_path, max_dim=0, priority=PRIORITY_INFO,
+                                        derive=lambda image, size: (size.width(), size.height()),
+                                        callback=self._on_image_info_loaded)
             
         # Display the first of the newly added images if nothing is selected
         if not self.current_image_path:
             self.display_image(new_images[0])
         self._update_navigation_enabled()
 
-    def _on_image_info_loaded(self, path, w, h):
+    def _on_image_info_loaded(self, request, dims, is_final):
         from core.processor import calculate_default_crop
         
-        # Cleanup worker reference
-        if path in self.info_workers:
-            del self.info_workers[path]
-            
-        self.path_to_dims[path] = (w, h)
+        path = request.path
+        if dims is None or path not in self.edit_state:
+            return
+        w, h = dims
+        self.edit_state.set_size(path, w, h)
         
         # Calculate initial crop now that we have dimensions
         ratio_str = self._get_active_ratio()
         default_crop = calculate_default_crop(w, h, ratio_str)
         
-        if path not in self.image_data:
-            self.image_data[path] = {
-                'crop': default_crop,
-                'ratio': ratio_str,
-                'touched': True # Default to touched for initial auto-crop
-            }
+        # The image on the canvas already has its state (see display_image)
+        if self.edit_state.crop(path) is None and path != self.current_image_path:
+            self.edit_state.set_crop(path, default_crop)
+            self.edit_state.set_ratio(path, ratio_str)
+            self.edit_state.set_touched(path)  # Default to touched for initial auto-crop
         
-        # Update camera roll thumbnail with the correct default crop
-        self.camera_roll.update_thumbnail(path, default_crop, 0, False, False)
+        # The camera roll thumbnail requested on add is already center-cropped
+        # to this ratio, which is what the default crop is
         
         # If this is the current image, update canvas too
         if path == self.current_image_path:
@@ -446,21 +523,11 @@ class MainWindow(QMainWindow):
             self.canvas.restore_crop_rect(default_crop)
 
     def save_current_state(self):
-        if self.current_image_path:
-            norm_rect = self.canvas.get_normalized_crop_rect()
-            ratio = self._get_active_ratio()
-            touched = self.image_data.get(self.current_image_path, {}).get('touched', False)
-            
-            rot, fh, fv = self.canvas.get_transform_state()
-            
-            self.image_data[self.current_image_path] = {
-                'crop': norm_rect,
-                'ratio': ratio,
-                'touched': touched,
-                'rotation': rot,
-                'flip_h': fh,
-                'flip_v': fv
-            }
+        if self.current_image_path in self.edit_state:
+            path = self.current_image_path
+            self.edit_state.set_crop(path, self.canvas.get_normalized_crop_rect())
+            self.edit_state.set_ratio(path, self._get_active_ratio())
+            self.edit_state.set_transform(path, *self.canvas.get_transform_state())
 
     def display_image(self, path):
         if self.current_image_path == path:
@@ -475,24 +542,36 @@ class MainWindow(QMainWindow):
         # Sync selection in lists
         self.sync_selection(path)
         
-        # Try Cache
+        # Show the best pixels on hand; _on_image_cached upgrades in place
+        self._begin_navigation(path)
         cached_image, is_full = self.image_cache.get_image(path)
+        tier = TIER_FULL if is_full else TIER_PROXY
+        lookup_s = time.perf_counter() - self._display_started
+        self._nav_record['lookup_ms'] = lookup_s * 1000
+        metrics.observe('display.lookup', lookup_s)
         
         if cached_image:
-            from PySide6.QtGui import QPixmap
-            pixmap = QPixmap.fromImage(cached_image)
+            upload_start = time.perf_counter()
+            pixmap = self._pixmap_for_display(cached_image)
             self.canvas.load_image(pixmap)
+            self._set_display_tier(tier, time.perf_counter() - upload_start)
         else:
-            # NO synchronous fallback. Clear canvas and wait for cache signal.
-            self.canvas.clear()
+            thumbnail = self.camera_roll.thumbnail_pixmap(path)
+            if thumbnail is not None:
+                # The camera roll's cropped thumbnail until the EXIF preview
+                # or a decode arrives (_on_preview_ready, _on_image_cached)
+                self.canvas.show_placeholder(thumbnail)
+                self._set_display_tier(TIER_THUMBNAIL)
+            else:
+                self.canvas.clear()
         
         # Update Cache Window
-        self.image_cache.update_window(path, self.all_paths)
+        self.image_cache.update_window(path, self.image_set)
             
         # Restore state or default
-        if path in self.image_data:
-            data = self.image_data[path]
-            ratio = data.get('ratio', "4:5")
+        crop = self.edit_state.crop(path)
+        if crop is not None:
+            ratio = self.edit_state.ratio(path)
             
             # Block signals to prevent triggering update_aspect_ratio (global override) 
             # while we are just switching images
@@ -505,12 +584,9 @@ class MainWindow(QMainWindow):
             self.canvas.set_aspect_ratio(ratio)
             
             # Restore Transform
-            rot = data.get('rotation', 0)
-            fh = data.get('flip_h', False)
-            fv = data.get('flip_v', False)
-            self.canvas.set_transform_state(rot, fh, fv)
+            self.canvas.set_transform_state(*self.edit_state.transform(path))
             
-            self.canvas.restore_crop_rect(data['crop'])
+            self.canvas.restore_crop_rect(crop)
         else:
             # Default: just set aspect ratio, canvas center it by default
             try:
@@ -519,24 +595,19 @@ class MainWindow(QMainWindow):
                 current_ratio = "4:5"
                 
             self.canvas.set_aspect_ratio(current_ratio)
-            # Initialize image data WITHOUT a crop rect yet - let canvas set default
-            self.image_data[path] = {
-                'touched': False, 
-                'ratio': current_ratio
-            }
+            # No crop rect yet - let canvas set default
+            self.edit_state.set_ratio(path, current_ratio)
+            self.edit_state.set_touched(path, False)
             
         # Refresh thumbnail based on touched state
-        if self.image_data[path].get('touched', False):
+        touched = self.edit_state.touched(path)
+        if touched:
             self._refresh_thumbnail()
         else:
-            data = self.image_data.get(path, {})
-            rot = data.get('rotation', 0)
-            fh = data.get('flip_h', False)
-            fv = data.get('flip_v', False)
-            self.camera_roll.refresh_thumbnail(path, rot, fh, fv)
+            self.camera_roll.refresh_thumbnail(path, *self.edit_state.transform(path))
 
         # Start timer to mark as touched
-        if not self.image_data[path].get('touched', False):
+        if not touched:
             self.touch_timer.start()
 
         # Preserve whichever mode (preview or edit) was active before switching
@@ -544,7 +615,7 @@ class MainWindow(QMainWindow):
             self.canvas.toggle_preview()
 
         # Sync Skip button text
-        if path in self.hidden_paths:
+        if self.image_set.is_hidden(path):
             self.skip_btn.setText("Unskip")
         else:
             self.skip_btn.setText("Skip")
@@ -554,46 +625,29 @@ class MainWindow(QMainWindow):
         self.canvas.set_aspect_ratio(text)
         self.camera_roll.set_aspect_ratio(text)
         
-        from core.processor import calculate_default_crop
-        
-        for path in self.all_paths:
-            if path in self.path_to_dims:
-                w, h = self.path_to_dims[path]
-                
-                # Account for rotation when calculating default crop
-                data = self.image_data.get(path, {})
-                rot = data.get('rotation', 0)
-                fh = data.get('flip_h', False)
-                fv = data.get('flip_v', False)
-                
-                # Visible dimensions after rotation (90, 270 deg swaps dims)
-                calc_w, calc_h = w, h
-                if rot % 180 != 0:
-                    calc_w, calc_h = h, w
-                    
-                new_crop = calculate_default_crop(calc_w, calc_h, text)
-                
-                if path not in self.image_data:
-                    self.image_data[path] = {}
-                
-                # If this is the current image, let the canvas provide the precise crop 
-                # (it might have done extra fitting/shrinking)
-                if path == self.current_image_path:
-                    new_crop = self.canvas.get_normalized_crop_rect()
-                
-                self.image_data[path]['crop'] = new_crop
-                self.image_data[path]['ratio'] = text
-                
-                # Update thumbnail in camera roll (except if it's the current image,
-                # which will be updated by the canvas's crop_changed signal debounce)
-                if path != self.current_image_path:
-                    self.camera_roll.update_thumbnail(path, new_crop, rot, fh, fv)
-            else:
-                # If dimensions not loaded yet, ratio will be applied when info worker finishes
-                if path not in self.image_data:
-                    self.image_data[path] = {}
-                self.image_data[path]['ratio'] = text
-        
+        # Every image gets the default crop for the new ratio in one pass over
+        # the store; the canvas has the precise one for the image it shows
+        current = self.current_image_path
+        self.edit_state.apply_default_crops(text, keep=current)
+        if current in self.edit_state and self.edit_state.size(current):
+            self.edit_state.set_crop(current, self.canvas.get_normalized_crop_rect())
+
+        # Default crops are what uncropped thumbnails show; the current one
+        # follows the canvas's crop_changed signal debounce
+        self.camera_roll.reset_crops(keep=current)
+
+    def closeEvent(self, event):
+        # No file reads or decodes may call back into the closed window
+        if self.decode_service.read_ahead is not None:
+            self.decode_service.read_ahead.shutdown()
+        self.decode_service.clear()
+        self.decode_service.thread_pool.waitForDone()
+
+        # Thumbnails still queued for the database are written before exit
+        if self.thumbnail_db is not None:
+            self.thumbnail_db.close()
+        super().closeEvent(event)
+
     def eventFilter(self, watched, event):
         from PySide6.QtCore import QEvent, Qt
         
@@ -629,9 +683,92 @@ class MainWindow(QMainWindow):
             elif event.key() == Qt.Key.Key_Space:
                 self.canvas.toggle_preview()
                 return True
+            
+            elif event.key() == Qt.Key.Key_F3:
+                if event.modifiers() & Qt.KeyboardModifier.ShiftModifier:
+                    self.export_metrics()
+                else:
+                    self.toggle_hud()
+                return True
                 
         return super().eventFilter(watched, event)
 
+    def toggle_hud(self):
+        if self.hud_timer.isActive():
+            self.hud_timer.stop()
+            self.canvas.set_hud([])
+        else:
+            self._update_hud()
+            self.hud_timer.start()
+
+    def _update_hud(self):
+        def ms(value):
+            return "-" if value is None else f"{value:.0f}"
+
+        def hist_ms(snapshot, name, key='p50'):
+            h = snapshot['histograms'].get(name)
+            return ms(h[key] * 1000 if h and h[key] is not None else None)
+
+        snap = metrics.snapshot()
+        counters, gauges = snap['counters'], snap['gauges']
+        lines = []
+        for label, record in (("now ", self._nav_record), ("prev", metrics.last_navigation())):
+            if record:
+                lines.append(f"{label} {record['image'][:24]:24} lookup {ms(record['lookup_ms'])} "
+                             f"decode {ms(record['decode_ms'])} upload {ms(record['upload_ms'])} "
+                             f"first {ms(record['first_pixels_ms'])} ({record['first_tier'] or '-'}) "
+                             f"{record['tier']} @ {ms(record['shown_ms'])} ms")
+        lines.append(f"first pixels p50 {hist_ms(snap, 'display.first_pixels')} "
+                     f"p95 {hist_ms(snap, 'display.first_pixels', 'p95')} ms  "
+                     f"GUI convert p95 {hist_ms(snap, 'display.convert', 'p95')} ms  "
+                     f"copies {counters.get('display.copies', 0)}")
+
+        cache = self.image_cache.stats()
+        lines.append(f"cache {cache['bytes_used'] / 2**20:.0f}/{cache['byte_budget'] / 2**20:.0f} MB "
+                     f"{cache['entries']} images  hit {cache['hit_rate']:.0%}  "
+                     f"dropped {cache['dropped_results']}  evicted {counters.get('cache.evictions', 0)}")
+        lines.append(f"decode pending {gauges.get('decode.pending_jobs', 0)}  "
+                     f"full p50 {hist_ms(snap, 'decode.full')}  scaled p50 {hist_ms(snap, 'decode.scaled')}  "
+                     f"queue p50 {hist_ms(snap, 'decode.queue_wait')} ms  "
+                     f"merged {counters.get('decode.merged', 0)}/{counters.get('decode.requests', 0)}  "
+                     f"disk cache {counters.get('disk_cache.hits', 0)}/"
+                     f"{counters.get('disk_cache.hits', 0) + counters.get('disk_cache.misses', 0)}")
+        read_ahead = self.decode_service.read_ahead
+        if read_ahead is not None:
+            stats = read_ahead.stats()
+            lines.append(f"read-ahead {stats['buffered_mb']:.0f}/{read_ahead.max_bytes / 2**20:.0f} MB  "
+                         f"hits {stats['hits']}  misses {stats['misses']}")
+            for root, root_stats in stats['roots'].items():
+                lines.append(f"  {root[:30]:30} {root_stats['mb_per_s']:.0f} MB/s  "
+                             f"{root_stats['latency_ms']:.1f} ms  {root_stats['files']} files")
+        lines.append(f"thumbnails {counters.get('thumbnails.delivered', 0)}/"
+                     f"{counters.get('thumbnails.requested', 0)}  "
+                     f"exif {counters.get('thumbnails.placeholders', 0)}  "
+                     f"superseded {counters.get('thumbnails.superseded', 0)}  "
+                     f"db {counters.get('thumbnail_db.hits', 0)}/"
+                     f"{counters.get('thumbnail_db.hits', 0) + counters.get('thumbnail_db.misses', 0)}")
+        self.canvas.set_hud(lines)
+
+    def export_metrics(self):
+        """Writes the HUD's data, with every histogram and recent navigation, to a JSON file."""
+        from PySide6.QtWidgets import QFileDialog
+        path, _ = QFileDialog.getSaveFileName(self, "Export Load Statistics", "quickcrop-metrics.json",
+                                              "JSON (*.json)")
+        if not path:
+            return
+        extra = {
+            'current_navigation': self._nav_record,
+            'cache': self.image_cache.stats(),
+            'proxy_size': PROXY_SIZE,
+            'proxy_window': self.image_cache.proxy_window,
+        }
+        if self.decode_service.read_ahead is not None:
+            extra['read_ahead'] = self.decode_service.read_ahead.stats()
+        try:
+            metrics.write_json(path, extra)
+        except OSError as e:
+            print(f"Error exporting metrics: {e}")
+
     def navigate(self, direction):
         """Buffer navigation requests to handle rapid clicks."""
         self._pending_nav_direction += direction
@@ -645,47 +782,18 @@ class MainWindow(QMainWindow):
         if direction == 0:
             return
 
-        current_row = self.image_list.currentRow()
-        if current_row == -1:
-            if self.image_list.count() > 0:
+        current_row = self.image_set.row_of(self.current_image_path)
+        if current_row is None:
+            if len(self.image_set) > 0:
                 current_row = 0
             else:
                 return
 
-        # Find target row by stepping one by one to handle skips correctly
-        target_row = current_row
-        steps_to_take = abs(direction)
-        step = 1 if direction > 0 else -1
-        count = self.image_list.count()
-        
-        # Avoid infinite loop if all images are hidden or only one remains
-        non_hidden_count = count - len(self.hidden_paths)
-        if non_hidden_count <= 0:
-            return
-
-        # Cap steps to take to avoid multiple unnecessary loops
-        # (Though with 20ms buffer it's unlikely to be huge)
-        steps_to_take %= non_hidden_count
-        if steps_to_take == 0 and abs(direction) > 0:
-            # If we navigated exactly one full circle of visible images, just stay here.
-            # But usually we at least want to move if it's a single click.
-            if abs(direction) < non_hidden_count:
-                steps_to_take = abs(direction)
-            else:
-                return
-
-        while steps_to_take > 0:
-            target_row = (target_row + step) % count
-            # If this image is skipped, we don't count it as a "step"
-            path = self.image_list.item(target_row).data(100)
-            if path not in self.hidden_paths:
-                steps_to_take -= 1
-        
-        if target_row != current_row:
-            self.image_list.setCurrentRow(target_row)
-            item = self.image_list.item(target_row)
-            path = item.data(100)
-            self.display_image(path)
+        # Skipped images don't count as a step; a full circle stays put
+        target_row = self.image_set.step_visible(current_row, direction)
+        if target_row is not None and target_row != current_row:
+            self.image_cache.record_navigation(direction)
+            self.display_image(self.image_set.path_at(target_row))
 
     def keyPressEvent(self, event):
         # This is now mostly a fallback as eventFilter should catch the main keys
@@ -699,8 +807,7 @@ class MainWindow(QMainWindow):
         from PySide6.QtWidgets import QMessageBox
         from ui.processing_dialog import ProcessingDialog
         
-        count = self.image_list.count()
-        if count == 0: return
+        if len(self.image_set) == 0: return
 
         # Output folder is mandatory to avoid accidental overwrites
         out_dir = self.output_dir
@@ -727,29 +834,38 @@ class MainWindow(QMainWindow):
         target_res = self.res_spin.value()
         res_mode = self.res_mode_combo.currentText()
         
+        # Encoder parameters
+        from core.processor import output_filename
+        encoder = self.encoder_combo.currentText()
+        preset = self.preset_combo.currentText()
+        target_kb = self.target_kb_spin.value()
+        
+        # Extra sizes are produced from the same decode as the main output
+        variants = None
+        if self.extra_sizes:
+            from core.processor import parse_variant_sizes
+            try:
+                extra = parse_variant_sizes(self.extra_sizes)
+            except ValueError:
+                extra = []
+            if extra:
+                variants = [{}] + extra
+        
         # Collect tasks
         tasks = []
         visible_index = 1
-        for i in range(count):
-            item = self.image_list.item(i)
-            path = item.data(100)
-            
-            if path in self.hidden_paths:
+        for path in self.image_set:
+            if self.image_set.is_hidden(path):
                 continue
 
             # Get crop data
-            if path in self.image_data and 'crop' in self.image_data[path]:
-                crop = self.image_data[path]['crop']
-            else:
+            crop = self.edit_state.crop(path)
+            if crop is None:
                 # Use centralized helper for default
                 try:
-                    from PIL import Image, ImageOps
-                    from core.processor import calculate_default_crop
-                    with Image.open(path) as img:
-                        img = ImageOps.exif_transpose(img)
-                        w, h = img.size
-                        ratio_str = self.image_data.get(path, {}).get('ratio', self._get_active_ratio() if not self.arrange_mode else "4:5")
-                        crop = calculate_default_crop(w, h, ratio_str)
+                    from core.processor import calculate_default_crop, read_oriented_size
+                    w, h = read_oriented_size(path)
+                    crop = calculate_default_crop(w, h, self.edit_state.ratio(path))
                 except Exception as e:
                     print(f"Error calculating default crop for processing {path}: {e}")
                     continue
@@ -761,12 +877,10 @@ class MainWindow(QMainWindow):
                 filename = f"{self.rename_string}_{visible_index:02}{ext}"
                 visible_index += 1
                 
-            out_path = os.path.join(out_dir, filename)
+            out_path = os.path.join(out_dir, output_filename(filename, encoder))
             
             # Get transform state
-            rot = self.image_data.get(path, {}).get('rotation', 0)
-            fh = self.image_data.get(path, {}).get('flip_h', False)
-            fv = self.image_data.get(path, {}).get('flip_v', False)
+            rot, fh, fv = self.edit_state.transform(path)
             
             tasks.append({
                 'path': path,
@@ -781,22 +895,29 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "No Images", "No images to process (they might all be skipped).")
             return
 
+        # Full-quality decodes already in the cache spare the export a disk decode
+        decoded_images = {}
+        for task in tasks:
+            image = self.image_cache.get_full_image(task['path'])
+            if image is not None:
+                decoded_images[task['path']] = image
+
         # Show Processing Dialog
         dialog = ProcessingDialog(self)
-        dialog.start_processing(tasks, downsample, target_res, res_mode)
+        dialog.start_processing(tasks, downsample, target_res, res_mode,
+                                memory_budget=self.export_memory_mb * 1024 * 1024,
+                                decoded_images=decoded_images,
+                                encoder=encoder, preset=preset, target_kb=target_kb,
+                                variants=variants)
         dialog.exec()
 
 
 
     def clear_images(self):
-        self.image_list.clear()
-        self.camera_roll.clear()
+        self.image_set.clear()
         self.image_cache.clear()
-        self.image_data = {}
+        self.edit_state.clear()
         self.current_image_path = None
-        self.all_paths = []
-        self.path_to_index = {}
-        self.hidden_paths = set()
         self.canvas.clear()
         self._update_navigation_enabled()
 
@@ -847,26 +968,37 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'res_mode_combo'):
             self.res_mode_combo.setEnabled(checked)
 
-    def _on_items_reordered(self, new_paths):
-        # Update internal tracking to match new order
-        self.all_paths = new_paths
-        self.path_to_index = {p: i for i, p in enumerate(self.all_paths)}
-        
-        # We also need to reorder the ImageList to keep them in sync
-        # (Though it's hidden in arrange mode, it should be correct when we return)
-        self.image_list.clear() # Simple way: clear and re-add
-        import os
-        for path in self.all_paths:
-            self.image_list.add_image(os.path.basename(path), path)
-            
-        # Re-apply strikeout for hidden paths
-        for path in self.hidden_paths:
-            idx = self.path_to_index[path]
-            item = self.image_list.item(idx)
-            font = item.font()
-            font.setStrikeOut(True)
-            item.setFont(font)
-            item.setForeground(Qt.GlobalColor.gray)
+    def _edit_extra_sizes(self):
+        from core.processor import parse_variant_sizes
+        seed = self.extra_sizes
+        while True:
+            text, ok = QInputDialog.getText(
+                self,
+                "Additional Sizes",
+                "Extra output sizes, comma separated (e.g. 2160, 320).\n"
+                "Append 'h' to fit the height instead of the width.\nLeave empty for none.",
+                text=seed
+            )
+            if not ok:
+                return
+            try:
+                parse_variant_sizes(text)
+                break
+            except ValueError:
+                QMessageBox.warning(self, "Invalid Sizes", "Please enter sizes like: 2160, 320h")
+                seed = text
+
+        self.extra_sizes = text.strip()
+        self.settings.setValue("extra_sizes", self.extra_sizes)
+        self._update_sizes_button()
+
+    def _update_sizes_button(self):
+        from core.processor import parse_variant_sizes
+        try:
+            count = len(parse_variant_sizes(self.extra_sizes))
+        except ValueError:
+            count = 0
+        self.sizes_btn.setText(f"+{count} Sizes" if count else "+ Sizes")
 
     def reset_current_image(self):
         if self.current_image_path:
@@ -875,13 +1007,11 @@ class MainWindow(QMainWindow):
             self.canvas.reset_crop_rect()
             
             # Update internal data
-            if self.current_image_path in self.image_data:
-                data = self.image_data[self.current_image_path]
-                data['rotation'] = 0.0
-                data['flip_h'] = False
-                data['flip_v'] = False
-                data['crop'] = self.canvas.get_normalized_crop_rect()
-                data['touched'] = True
+            if self.current_image_path in self.edit_state:
+                path = self.current_image_path
+                self.edit_state.set_transform(path, 0.0, False, False)
+                self.edit_state.set_crop(path, self.canvas.get_normalized_crop_rect())
+                self.edit_state.set_touched(path)
             
             # Refresh UI
             self._refresh_thumbnail()
@@ -889,63 +1019,58 @@ class MainWindow(QMainWindow):
             self.canvas.update()
 
     def sync_selection(self, path):
-        if path not in self.path_to_index:
-            return
-            
-        idx = self.path_to_index[path]
-        
-        # Sync Image List
-        if 0 <= idx < self.image_list.count():
-            item = self.image_list.item(idx)
-            self.image_list.setCurrentItem(item)
-            self.image_list.scrollToItem(item)
-                
-        # Sync Camera Roll
-        if 0 <= idx < self.camera_roll.count():
-            item = self.camera_roll.item(idx)
-            self.camera_roll.setCurrentItem(item)
-            self.camera_roll.scrollToItem(item)
-
-    def _on_camera_roll_double_clicked(self, item):
-        path = item.data(100)
+        self.image_list.set_current_path(path)
+        self.camera_roll.set_current_path(path)
+
+    def _on_camera_roll_double_clicked(self, path):
         self.toggle_hide(path)
         # Update Skip button if current image changed state
         if path == self.current_image_path:
-            self.skip_btn.setText("Unskip" if path in self.hidden_paths else "Skip")
+            self.skip_btn.setText("Unskip" if self.image_set.is_hidden(path) else "Skip")
 
     def _on_image_cached(self, path, image, is_full):
-        # If the newly cached image is the one we are currently trying to display, update canvas
+        self._show_decoded(path, image, TIER_FULL if is_full else TIER_PROXY)
+
+    def _on_preview_ready(self, path, image):
+        self._show_decoded(path, image, TIER_PREVIEW)
+
+    def _show_decoded(self, path, image, tier):
+        # If the newly decoded image is the one we are currently trying to display, update canvas
         if path == self.current_image_path:
-            # If we already have a full image, don't downgrade to a proxy
-            if not is_full:
-                existing_img, existing_is_full = self.image_cache.get_image(path)
-                if existing_is_full and existing_img:
-                    return
-
-            from PySide6.QtGui import QPixmap
-            pixmap = QPixmap.fromImage(image)
+            # Never downgrade what's on screen
+            if tier <= self._display_tier:
+                return
+
+            upload_start = time.perf_counter()
+            pixmap = self._pixmap_for_display(image)
+            decode_s = self.image_cache.decode_seconds.get(path) if tier > TIER_PREVIEW else None
+            if self._display_tier >= TIER_PREVIEW:
+                # Same image at a higher resolution: crop, rotation and view carry over
+                self.canvas.replace_pixmap(pixmap)
+                self._set_display_tier(tier, time.perf_counter() - upload_start, decode_s)
+                return
+
             self.canvas.load_image(pixmap)
+            self._set_display_tier(tier, time.perf_counter() - upload_start, decode_s)
             
             # Restore state (since display_image might have been called but skipped load_image)
-            if path in self.image_data:
-                data = self.image_data[path]
-                ratio = data.get('ratio', self._get_active_ratio())
+            if path in self.edit_state:
+                ratio = self.edit_state.ratio(path)
                 self._ensure_ratio_in_combo(ratio)
                 self.canvas.set_aspect_ratio(ratio)
                 
                 # Restore Transform
-                rot = data.get('rotation', 0)
-                fh = data.get('flip_h', False)
-                fv = data.get('flip_v', False)
-                self.canvas.set_transform_state(rot, fh, fv)
+                self.canvas.set_transform_state(*self.edit_state.transform(path))
 
                 # Only restore if we have valid crop data AND the image was already touched/saved
                 # This prevents "stub" crops from being applied to fresh images
-                if 'crop' in data and data.get('touched', False):
-                    self.canvas.restore_crop_rect(data['crop'])
+                crop = self.edit_state.crop(path)
+                touched = self.edit_state.touched(path)
+                if crop is not None and touched:
+                    self.canvas.restore_crop_rect(crop)
                 
                 # Update thumbnail if touched
-                if data.get('touched', False):
+                if touched:
                     self._refresh_thumbnail()
             else:
                 self.canvas.set_aspect_ratio(self._get_active_ratio())
@@ -955,39 +1080,71 @@ class MainWindow(QMainWindow):
                  # Re-trigger fitting for the new image if not already handled
                  self.canvas.restore_crop_rect(self.canvas.norm_crop_rect)
 
+    def _pixmap_for_display(self, image):
+        """
+        QPixmap for the canvas. Images from the decode service are display-ready,
+        so it shares the cache's pixels; anything else is converted and copied
+        here on the GUI thread, which is timed and counted.
+        """
+        from PySide6.QtGui import QPixmap
+        start = time.perf_counter()
+        pixmap = QPixmap.fromImage(image)
+        metrics.observe('display.convert', time.perf_counter() - start)
+        if pixmap.toImage().cacheKey() != image.cacheKey():
+            metrics.count('display.copies')
+        return pixmap
+
+    def _begin_navigation(self, path):
+        """Starts the latency record of showing path; the previous one goes to metrics."""
+        import os
+        if self._nav_record is not None:
+            metrics.record_navigation(self._nav_record)
+        self._display_tier = TIER_NONE
+        self._display_started = time.perf_counter()
+        self._nav_record = {
+            'image': os.path.basename(path),
+            'lookup_ms': None,       # cache lookup
+            'decode_ms': None,       # decode of the image that arrived after navigating
+            'upload_ms': 0.0,        # QPixmap conversion and canvas update, all tiers
+            'first_pixels_ms': None,
+            'first_tier': None,
+            'tier': TIER_NAMES[TIER_NONE],
+            'shown_ms': None,        # when the current tier went up
+        }
+
+    def _set_display_tier(self, tier, upload_s=0.0, decode_s=None):
+        elapsed = time.perf_counter() - self._display_started
+        record = self._nav_record
+        record['upload_ms'] += upload_s * 1000
+        if decode_s is not None:
+            record['decode_ms'] = decode_s * 1000
+        if self._display_tier == TIER_NONE:
+            record['first_pixels_ms'] = elapsed * 1000
+            record['first_tier'] = TIER_NAMES[tier]
+            metrics.observe('display.first_pixels', elapsed)
+        metrics.observe('display.upload', upload_s)
+        record['tier'] = TIER_NAMES[tier]
+        record['shown_ms'] = elapsed * 1000
+        self._display_tier = tier
+
     def _on_crop_changed(self):
         # Mark as touched if not already
-        if self.current_image_path:
-            if self.current_image_path not in self.image_data:
-                 self.image_data[self.current_image_path] = {
-                    'touched': True,
-                    'crop': self.canvas.get_normalized_crop_rect(),
-                    'ratio': self._get_active_ratio()
-                }
-            else:
-                self.image_data[self.current_image_path]['touched'] = True
+        if self.current_image_path in self.edit_state:
+            self.edit_state.set_touched(self.current_image_path)
         
         # Debounce to avoid too many updates while dragging
         self.thumb_update_timer.start(300)
 
     def _mark_current_as_touched(self):
-        if self.current_image_path and self.canvas.pixmap_item:
+        if self.current_image_path in self.edit_state and self.canvas.pixmap_item:
             # Only act if the canvas actually has an image loaded
             # (prevents capturing stub crop from an empty/initializing canvas)
-            
-            # Ensure path exists in data
-            if self.current_image_path not in self.image_data:
-                 self.image_data[self.current_image_path] = {
-                    'ratio': self._get_active_ratio()
-                }
+            path = self.current_image_path
             
             # NOW capture the crop rect (canvas is guaranteed to be ready after 1s)
-            self.image_data[self.current_image_path]['crop'] = self.canvas.get_normalized_crop_rect()
-            rot, fh, fv = self.canvas.get_transform_state()
-            self.image_data[self.current_image_path]['rotation'] = rot
-            self.image_data[self.current_image_path]['flip_h'] = fh
-            self.image_data[self.current_image_path]['flip_v'] = fv
-            self.image_data[self.current_image_path]['touched'] = True
+            self.edit_state.set_crop(path, self.canvas.get_normalized_crop_rect())
+            self.edit_state.set_transform(path, *self.canvas.get_transform_state())
+            self.edit_state.set_touched(path)
             
             # Refresh thumbnail to switch to crop AR
             self._refresh_thumbnail()
@@ -1100,7 +1257,7 @@ class MainWindow(QMainWindow):
         if self.current_image_path:
             self.toggle_hide(self.current_image_path)
             # Update button text
-            if self.current_image_path in self.hidden_paths:
+            if self.image_set.is_hidden(self.current_image_path):
                 self.skip_btn.setText("Unskip")
             else:
                 self.skip_btn.setText("Skip")
@@ -1110,46 +1267,23 @@ class MainWindow(QMainWindow):
             self.remove_image(self.current_image_path)
 
     def toggle_hide(self, path):
-        if path in self.hidden_paths:
-            self.hidden_paths.remove(path)
-            hidden = False
-        else:
-            self.hidden_paths.add(path)
-            hidden = True
-        
-        # Update Camera Roll Visuals
-        self.camera_roll.set_hidden(path, hidden)
-        
-        # Update Image List Visuals
-        if path in self.path_to_index:
-            idx = self.path_to_index[path]
-            item = self.image_list.item(idx)
-            if hidden:
-                font = item.font()
-                font.setStrikeOut(True)
-                item.setFont(font)
-                item.setForeground(Qt.GlobalColor.gray)
-            else:
-                font = item.font()
-                font.setStrikeOut(False)
-                item.setFont(font)
-                item.setForeground(Qt.GlobalColor.black)
-
+        # The image list and camera roll restyle the row themselves
+        self.image_set.set_hidden(path, not self.image_set.is_hidden(path))
         self._update_navigation_enabled()
 
     def remove_image(self, path):
-        if path not in self.path_to_index:
+        idx = self.image_set.row_of(path)
+        if idx is None:
             return
             
         # Is it the current image?
         if self.current_image_path == path:
             # Try to select next image
-            idx = self.path_to_index[path]
             next_path = None
-            if idx + 1 < len(self.all_paths):
-                next_path = self.all_paths[idx + 1]
+            if idx + 1 < len(self.image_set):
+                next_path = self.image_set.path_at(idx + 1)
             elif idx - 1 >= 0:
-                next_path = self.all_paths[idx - 1]
+                next_path = self.image_set.path_at(idx - 1)
                 
             if next_path:
                 self.display_image(next_path)
@@ -1157,24 +1291,9 @@ class MainWindow(QMainWindow):
                 self.canvas.clear()
                 self.current_image_path = None
 
-        # Remove from internal lists
-        old_idx = self.path_to_index[path]
-        self.all_paths.pop(old_idx)
-        if path in self.hidden_paths:
-            self.hidden_paths.remove(path)
-        if path in self.image_data:
-            del self.image_data[path]
-            
-        # Rebuild path_to_index
-        self.path_to_index = {p: i for i, p in enumerate(self.all_paths)}
-        
-        # Update UI components
-        # Image list
-        item = self.image_list.takeItem(old_idx)
-        del item
-        
-        # Camera roll
-        self.camera_roll.remove_path(path)
+        # The image list and camera roll drop the row themselves
+        self.image_set.remove(path)
+        self.edit_state.remove(path)
         
         # Sync selection if we moved to next
         if self.current_image_path:
@@ -1182,5 +1301,4 @@ class MainWindow(QMainWindow):
         self._update_navigation_enabled()
 
     def _update_navigation_enabled(self):
-        visible = sum(1 for path in self.all_paths if path not in self.hidden_paths)
-        self.canvas.set_navigation_enabled(visible > 1)
+        self.canvas.set_navigation_enabled(self.image_set.visible_count() > 1)
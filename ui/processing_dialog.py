@@ -1,22 +1,42 @@
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QProgressBar, QLabel,
-                             QPushButton, QHBoxLayout)
+                             QPushButton, QHBoxLayout, QTableWidget, QTableWidgetItem,
+                             QHeaderView)
 from PySide6.QtCore import Qt, Signal, QThread
 from PySide6.QtGui import QDesktopServices
 from PySide6.QtCore import QUrl
 import os
-from core.processor import process_image
+from core.export_engine import run_export
+from core.export_manifest import ExportManifest
+from core.image_cache import pil_image
+from core.export_timing import (ThroughputMeter, TIMING_REPORT_NAME, stage_totals,
+                                timing_record, write_timing_report)
+from core.processor import resolve_variants
+
+
+def outputs_per_image(options):
+    """Number of files written per source image for these export options."""
+    return len(resolve_variants("", options))
+
 
 class ProcessingWorker(QThread):
-    progress = Signal(int, str)  # current index, filename
+    progress = Signal(int, str)  # current output index, filename
+    skipped = Signal(int)        # number of unchanged images not re-exported
+    task_done = Signal(dict)     # timing record per exported image (see timing_record)
     finished = Signal(int, str)  # total processed, output directory
     error = Signal(str)          # error message
 
-    def __init__(self, tasks, downsample, target_res, res_mode):
+    def __init__(self, tasks, downsample, target_res, res_mode, workers=None, incremental=True,
+                 memory_budget=None, decoded_images=None, **export_options):
         super().__init__()
         self.tasks = tasks
         self.downsample = downsample
         self.target_res = target_res
         self.res_mode = res_mode
+        self.export_options = export_options  # encoder, preset, target_kb, variants
+        self.workers = workers  # None = pick automatically, 1 = sequential
+        self.incremental = incremental
+        self.memory_budget = memory_budget  # bytes; None/0 = default_memory_budget()
+        self.decoded_images = decoded_images or {}  # path -> full-quality QImage from the cache
         self._is_cancelled = False
 
     def cancel(self):
@@ -25,31 +45,58 @@ class ProcessingWorker(QThread):
     def run(self):
         processed_count = 0
         output_dir = ""
-        
-        for i, task in enumerate(self.tasks):
-            if self._is_cancelled:
-                break
-                
-            path = task['path']
-            crop = task['crop']
-            out_path = task['out_path']
-            rot = task.get('rotation', 0)
-            fh = task.get('flip_h', False)
-            fv = task.get('flip_v', False)
-            
-            filename = os.path.basename(path)
-            self.progress.emit(i, filename)
-            
-            success = process_image(path, crop, out_path, 
-                                   downsample=self.downsample, 
-                                   target_res=self.target_res, 
-                                   res_mode=self.res_mode,
-                                   rotation=rot, flip_h=fh, flip_v=fv)
-            
-            if success:
-                processed_count += 1
-                output_dir = os.path.dirname(out_path)
-            
+
+        options = {
+            'downsample': self.downsample,
+            'target_res': self.target_res,
+            'res_mode': self.res_mode,
+            **self.export_options,
+        }
+        outputs_per_task = outputs_per_image(options)
+
+        manifest = None
+        tasks = self.tasks
+        if self.incremental and tasks:
+            out_dirs = {os.path.dirname(os.path.abspath(t['out_path'])) for t in tasks}
+            manifest = ExportManifest.load(os.path.commonpath(list(out_dirs)))
+            tasks = [t for t in tasks if not manifest.is_current(t, options)]
+        skipped_count = len(self.tasks) - len(tasks)
+        if skipped_count:
+            self.skipped.emit(skipped_count)
+            output_dir = manifest.output_dir
+
+        # Only bridged to PIL if the export runs in-process and reaches the image
+        decoded = {path: (lambda image=image: pil_image(image))
+                   for path, image in self.decoded_images.items()}
+
+        try:
+            results = run_export(tasks, options, workers=self.workers,
+                                 is_cancelled=lambda: self._is_cancelled,
+                                 memory_budget=self.memory_budget, decoded=decoded)
+            for i, task, success, stats in results:
+                # One progress step per output variant, in task order
+                filename = os.path.basename(task['path'])
+                first = (skipped_count + i) * outputs_per_task
+                variants = stats.get('variants', [])
+                for j in range(outputs_per_task):
+                    label = filename
+                    if outputs_per_task > 1 and j < len(variants):
+                        label = f"{filename} → {os.path.relpath(variants[j]['out_path'], os.path.dirname(task['out_path']))}"
+                    self.progress.emit(first + j, label)
+                self.task_done.emit(timing_record(task, success, stats))
+
+                if success:
+                    processed_count += 1
+                    output_dir = os.path.dirname(task['out_path'])
+                    if manifest:
+                        manifest.record(task, options)
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        finally:
+            if manifest:
+                manifest.save()
+
         if not self._is_cancelled:
             self.finished.emit(processed_count, output_dir)
 
@@ -57,7 +104,7 @@ class ProcessingDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Processing Images")
-        self.setFixedSize(520, 220)
+        self.setFixedSize(520, 260)
         self.setModal(True)
         # Prevent closing with X during processing
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowType.WindowCloseButtonHint)
@@ -75,6 +122,18 @@ class ProcessingDialog(QDialog):
         self.status_label.setWordWrap(True)
         layout.addWidget(self.status_label)
         
+        self.rate_label = QLabel("")
+        layout.addWidget(self.rate_label)
+        
+        # Per-stage timing breakdown, hidden until "Details" is pressed
+        self.stage_table = QTableWidget(0, 4)
+        self.stage_table.setHorizontalHeaderLabels(["Stage", "Total (s)", "Avg (ms/image)", "Share"])
+        self.stage_table.verticalHeader().hide()
+        self.stage_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.stage_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.stage_table.hide()
+        layout.addWidget(self.stage_table)
+        
         self.btn_layout = QHBoxLayout()
         layout.addLayout(self.btn_layout)
         
@@ -82,6 +141,16 @@ class ProcessingDialog(QDialog):
         self.cancel_btn.clicked.connect(self.reject)
         self.btn_layout.addWidget(self.cancel_btn)
 
+        self.details_btn = QPushButton("Details")
+        self.details_btn.setCheckable(True)
+        self.details_btn.toggled.connect(self._toggle_details)
+        self.btn_layout.addWidget(self.details_btn)
+
+        self.report_btn = QPushButton("Save Timing Report")
+        self.report_btn.hide()
+        self.report_btn.clicked.connect(self.save_timing_report)
+        self.btn_layout.addWidget(self.report_btn)
+
         self.instagram_btn = QPushButton("Take a look")
         self.instagram_btn.setFixedHeight(24)
         self.instagram_btn.hide()
@@ -97,13 +166,31 @@ class ProcessingDialog(QDialog):
         self.btn_layout.addWidget(self.close_btn)
         
         self.worker = None
+        self.skipped_count = 0
+        self.outputs_per_task = 1
+        self.total_tasks = 0
+        self.output_dir = ""
+        self.records = []
+        self.meter = None
 
-    def start_processing(self, tasks, downsample, target_res, res_mode):
-        self.progress_bar.setMaximum(len(tasks))
+    def start_processing(self, tasks, downsample, target_res, res_mode, workers=None, incremental=True,
+                         memory_budget=None, decoded_images=None, **export_options):
+        self.outputs_per_task = outputs_per_image(export_options)
+        self.progress_bar.setMaximum(len(tasks) * self.outputs_per_task)
         self.progress_bar.setValue(0)
         
-        self.worker = ProcessingWorker(tasks, downsample, target_res, res_mode)
+        self.skipped_count = 0
+        self.total_tasks = len(tasks)
+        self.records = []
+        self.meter = ThroughputMeter()
+        self.worker = ProcessingWorker(tasks, downsample, target_res, res_mode,
+                                       workers=workers, incremental=incremental,
+                                       memory_budget=memory_budget,
+                                       decoded_images=decoded_images,
+                                       **export_options)
         self.worker.progress.connect(self.update_progress)
+        self.worker.skipped.connect(self.on_skipped)
+        self.worker.task_done.connect(self.on_task_done)
         self.worker.finished.connect(self.on_finished)
         self.worker.error.connect(self.on_error)
         self.worker.start()
@@ -111,15 +198,74 @@ class ProcessingDialog(QDialog):
     def update_progress(self, index, filename):
         self.progress_bar.setValue(index + 1)
         self.label.setText(f"Processing: {filename}")
-        self.status_label.setText(f"Image {index + 1} of {self.progress_bar.maximum()}")
+        if self.outputs_per_task > 1:
+            self.status_label.setText(f"Output {index + 1} of {self.progress_bar.maximum()}")
+        else:
+            self.status_label.setText(f"Image {index + 1} of {self.progress_bar.maximum()}")
+
+    def on_skipped(self, count):
+        self.skipped_count = count
+        self.progress_bar.setValue(count * self.outputs_per_task)
+        self.status_label.setText(f"{count} unchanged images already up to date")
+
+    def on_task_done(self, record):
+        self.records.append(record)
+        self.meter.add(record['bytes'])
+        images_per_s, mb_per_s = self.meter.rates()
+        remaining = self.total_tasks - self.skipped_count - len(self.records)
+        eta = self.meter.eta(remaining)
+        eta_text = f"{int(eta) // 60}:{int(eta) % 60:02d}" if eta is not None else "--:--"
+        self.rate_label.setText(f"{images_per_s:.1f} images/s · {mb_per_s:.1f} MB/s · ETA {eta_text}")
+        if self.stage_table.isVisible():
+            self._update_stage_table()
+
+    def _update_stage_table(self):
+        totals = stage_totals(self.records)
+        grand_total = sum(totals.values()) or 1.0
+        count = max(1, len(self.records))
+        self.stage_table.setRowCount(len(totals))
+        for row, (stage, seconds) in enumerate(totals.items()):
+            values = [stage, f"{seconds:.2f}", f"{seconds * 1000 / count:.1f}",
+                      f"{seconds * 100 / grand_total:.0f}%"]
+            for col, value in enumerate(values):
+                self.stage_table.setItem(row, col, QTableWidgetItem(value))
+
+    def _toggle_details(self, checked):
+        self.stage_table.setVisible(checked)
+        self.setFixedSize(520, 460 if checked else 260)
+        if checked:
+            self._update_stage_table()
+
+    def save_timing_report(self):
+        if not self.output_dir:
+            return
+        path = os.path.join(self.output_dir, TIMING_REPORT_NAME)
+        try:
+            write_timing_report(path, self.records)
+            self.rate_label.setText(f"Timing report saved to {path}")
+        except OSError as e:
+            self.rate_label.setText(f"Could not save timing report: {e}")
 
     def on_finished(self, count, out_dir):
         self.label.setText("Processing Complete!")
+        self.output_dir = out_dir
+        summary = f"Processed {count} images"
+        if self.skipped_count:
+            summary += f" ({self.skipped_count} unchanged, skipped)"
+        total_bytes = sum(r['bytes'] for r in self.records)
+        encode_seconds = stage_totals(self.records)['encode']
+        encode_summary = ""
+        if total_bytes:
+            encode_summary = f"Wrote {total_bytes / (1024 * 1024):.1f} MB, encoding took {encode_seconds:.1f} s\n"
         self.status_label.setText(
-            f"Processed {count} images to:\n{out_dir}\n\n"
+            f"{summary} to:\n{out_dir}\n{encode_summary}\n"
             "Thanks for using QuickCrop. We also design objects and explore digital craft: @juengerkuehn"
         )
         self.cancel_btn.hide()
+        if self.records:
+            self.report_btn.show()
+        if self.stage_table.isVisible():
+            self._update_stage_table()
         self.instagram_btn.show()
         self.close_btn.show()
         self.close_btn.setEnabled(True)
@@ -1,114 +1,118 @@
-from PySide6.QtCore import QRunnable, Signal, QObject, QMetaObject, Qt, QSize, QRect, QRectF
-from PySide6.QtGui import QImage, QImageReader, QColor, QPainter, QImageIOHandler, QTransform
+import math
+from PySide6.QtCore import Qt, QSize, QRectF
+from PySide6.QtGui import QImage, QPainter, QTransform
 
-class LoaderSignals(QObject):
-    finished = Signal(str, QImage)
 
-class ThumbnailLoader(QRunnable):
+class ThumbnailLoader:
+    """
+    A camera roll thumbnail as a DecodeService request: decode_size says how
+    large a decode it needs, render turns that decode into the thumbnail.
+    """
+
     def __init__(self, path, size=(100, 100), crop_rect=None, rotation=0, flip_h=False, flip_v=False):
-        super().__init__()
         self.path = path
         self.size = size
         self.crop_rect = crop_rect # (nx, ny, nw, nh)
         self.rotation = rotation
         self.flip_h = flip_h
         self.flip_v = flip_v
-        self.signals = LoaderSignals()
 
-    def run(self):
-        try:
-            reader = QImageReader(self.path)
-            reader.setAutoTransform(True)
-            
-            orig_size = reader.size()
-            
-            # For thumbnails, we want them to be crisp. 
-            # We'll load at 2x the requested size for high-DPI/sharper look.
-            quality_multiplier = 2
-            target_w = int(self.size[0] * quality_multiplier)
-            target_h = int(self.size[1] * quality_multiplier)
+        # For thumbnails, we want them to be crisp. 
+        # We'll load at 2x the requested size for high-DPI/sharper look.
+        quality_multiplier = 2
+        self.target_qsize = QSize(int(size[0] * quality_multiplier), int(size[1] * quality_multiplier))
+
+    def request(self, decode_service, callback, priority=0, source=None):
+        """
+        Queues this thumbnail; callback(request, thumbnail, is_final) gets a
+        QImage. source: (image, full_size) already in memory and at least
+        decode_size, rendered from instead of decoding the file.
+        """
+        return decode_service.request(self.path, max_dim=self.decode_size, priority=priority,
+                                      derive=self.render, callback=callback,
+                                      use_preview=source is None, source=source)
+
+    def decode_size(self, full_size):
+        """Longest side the source must be decoded at so the crop still covers the target."""
+        w, h = full_size.width(), full_size.height()
+        bound_w, bound_h = w, h
+        if self.rotation:
+            # The crop is relative to the rotated image's bounding box
+            angle = math.radians(self.rotation)
+            cos, sin = abs(math.cos(angle)), abs(math.sin(angle))
+            bound_w, bound_h = w * cos + h * sin, w * sin + h * cos
+        nw = nh = 1.0
+        if self.crop_rect:
+            nw, nh = (max(0.01, min(1.0, float(v))) if math.isfinite(v) else 1.0
+                      for v in self.crop_rect[2:])
+        scale = max(self.target_qsize.width() / (nw * bound_w),
+                    self.target_qsize.height() / (nh * bound_h))
+        if scale >= 1.0:
+            return None
+        return math.ceil(scale * max(w, h))
+
+    def render(self, image, full_size):
+        """
+        The thumbnail from image, the upright source at any scale that covers
+        decode_size: only the pixels under the crop are scaled to thumbnail
+        size, then rotated and flipped into place.
+        """
+        if image.isNull():
+            raise ValueError("Empty thumbnail")
+        tw, th = self.target_qsize.width(), self.target_qsize.height()
+        w, h = image.width(), image.height()
+
+        # Source -> rotated/flipped image with its bounding box at the origin,
+        # as QImage.transformed lays it out; the crop is relative to that box
+        t = QTransform()
+        t.scale(-1 if self.flip_h else 1, -1 if self.flip_v else 1)
+        t.rotate(self.rotation)  # Qt is clockwise
+        t = QImage.trueMatrix(t, w, h)
+        bounds = t.mapRect(QRectF(0, 0, w, h))
+        crop = self._crop_in(bounds.width(), bounds.height())
+
+        # Scale the crop to fill the target, centered (crop-to-fill)
+        k = max(tw / crop.width(), th / crop.height())
+        to_thumb = (t * QTransform.fromTranslate(-crop.x(), -crop.y()) * QTransform.fromScale(k, k)
+                    * QTransform.fromTranslate(-(crop.width() * k - tw) / 2, -(crop.height() * k - th) / 2))
 
-            # If we have complex transformations (rotation, crop), load a reasonably large version
-            # or the full image if it's not too massive.
-            needs_full = self.crop_rect is not None or self.rotation != 0 or self.flip_h or self.flip_v
-            
-            if needs_full:
-                image = reader.read()
-                if image.isNull():
-                    return
+        opaque = not image.hasAlphaChannel() and self.rotation % 90 == 0
+        thumbnail = QImage(tw, th, QImage.Format.Format_RGB32 if opaque
+                           else QImage.Format.Format_ARGB32_Premultiplied)
+        thumbnail.fill(Qt.GlobalColor.black if opaque else Qt.GlobalColor.transparent)
 
-                # 1. Apply Flips and Rotation
-                if self.flip_h or self.flip_v or self.rotation != 0:
-                    t = QTransform()
-                    # Flips
-                    t.scale(-1 if self.flip_h else 1, -1 if self.flip_v else 1)
-                    # Rotation (Qt is clockwise)
-                    t.rotate(self.rotation)
-                    
-                    image = image.transformed(t, Qt.TransformationMode.SmoothTransformation)
+        # Source pixels that land in the thumbnail, cut out and scaled first
+        # so the painter only rotates at about 1:1
+        inverse, _ = to_thumb.inverted()
+        needed = inverse.mapRect(QRectF(0, 0, tw, th)).toAlignedRect().adjusted(-2, -2, 2, 2)
+        needed = needed.intersected(image.rect())
+        if needed.isEmpty():
+            return thumbnail
+        region = image.copy(needed)
+        if k < 1.0:
+            region = region.scaled(max(1, math.ceil(needed.width() * k)), max(1, math.ceil(needed.height() * k)),
+                                   Qt.AspectRatioMode.IgnoreAspectRatio,
+                                   Qt.TransformationMode.SmoothTransformation)
+        to_source = (QTransform.fromScale(needed.width() / region.width(), needed.height() / region.height())
+                     * QTransform.fromTranslate(needed.x(), needed.y()))
 
-                # 2. Apply Crop if specified
-                if self.crop_rect:
-                    w, h = image.width(), image.height()
-                    nx, ny, nw, nh = self.crop_rect
-                    
-                    # Clamp crop to image bounds
-                    try:
-                        import math
-                        # Ensure values are finite and not ridiculous
-                        def sanitize(v):
-                            if not math.isfinite(v): return 0.0
-                            return max(-100.0, min(100.0, float(v)))
-                        
-                        nx = sanitize(nx)
-                        ny = sanitize(ny)
-                        nw = sanitize(nw)
-                        nh = sanitize(nh)
-                        
-                        rect = QRect(
-                            int(max(0, nx * w)),
-                            int(max(0, ny * h)),
-                            int(min(w, nw * w)),
-                            int(min(h, nh * h))
-                        )
-                    except (OverflowError, ValueError):
-                        rect = QRect()
-                    if rect.isValid():
-                        image = image.copy(rect)
+        painter = QPainter(thumbnail)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.setTransform(to_source * to_thumb)
+        painter.drawImage(0, 0, region)
+        painter.end()
+        return thumbnail
 
-            else:
-                # Optimized path for un-transformed thumbnails
-                if orig_size.isValid():
-                    scale_w = target_w / orig_size.width()
-                    scale_h = target_h / orig_size.height()
-                    scale = max(scale_w, scale_h) # Ensure we cover target size
-                    
-                    new_scaled_size = QSize(int(orig_size.width() * scale), int(orig_size.height() * scale))
-                    reader.setScaledSize(new_scaled_size)
-                image = reader.read()
+    def _crop_in(self, w, h):
+        """The normalized crop as a rect in a w x h box; the whole box if there is none."""
+        if self.crop_rect:
+            # Ensure values are finite and not ridiculous
+            def sanitize(v):
+                if not math.isfinite(v): return 0.0
+                return max(-100.0, min(100.0, float(v)))
 
-            if image and not image.isNull():
-                target_qsize = QSize(target_w, target_h)
-                
-                # Always scale to FILL (crop-to-fill)
-                scaled_img = image.scaled(
-                    target_qsize, 
-                    Qt.AspectRatioMode.KeepAspectRatioByExpanding, 
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                
-                # Center crop to exact target size
-                final_image = scaled_img.copy(
-                    (scaled_img.width() - target_qsize.width()) // 2,
-                    (scaled_img.height() - target_qsize.height()) // 2,
-                    target_qsize.width(),
-                    target_qsize.height()
-                )
-                
-                try:
-                    self.signals.finished.emit(self.path, final_image)
-                except RuntimeError:
-                    pass
-                
-        except Exception as e:
-            print(f"Thumbnail error: {e}")
+            nx, ny, nw, nh = (sanitize(v) for v in self.crop_rect)
+            rect = QRectF(max(0.0, nx * w), max(0.0, ny * h), min(w, nw * w), min(h, nh * h))
+            if rect.width() >= 1 and rect.height() >= 1:
+                return rect
+        return QRectF(0, 0, w, h)